@@ -0,0 +1,69 @@
+"""
+Startup benchmark: how long a fresh interpreter needs to import each
+pipeline entry point, and what the first task of each worker kind costs.
+
+Every case runs in a new `python -c` process (like a spawned pool worker)
+and is repeated; the median wall time is reported.
+
+Usage (from the project root):
+    python scripts/bench_startup.py [--repeat 5]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> code run in a fresh interpreter
+CASES = {
+    "interpreter only": "pass",
+    "import run_pipeline": "import src.pipeline.run_pipeline",
+    "import worker": "import src.pipeline.worker",
+    "detection worker (first task)": (
+        "import src.pipeline.worker\n"
+        "from src.detection.detect_bubbles import cv2, np\n"
+        "cv2.imread; np.mean"
+    ),
+    "tracking worker (first task)": (
+        "import src.pipeline.worker\n"
+        "from src.tracking.vel_track import cv2, np\n"
+        "cv2.imread; np.sqrt"
+    ),
+    "preprocessing worker (first task)": (
+        "import src.pipeline.worker\n"
+        "from src.preprocessing.preprocessing import cv2, np, measure, morphology\n"
+        "cv2.imread; np.empty; measure.label; morphology.remove_small_holes"
+    ),
+    "eager cv2 + numpy + skimage": "import cv2, numpy\nfrom skimage import measure, morphology",
+}
+
+
+def time_case(code, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def heavy_modules_after(code):
+    """Which heavy dependencies a case actually ended up importing."""
+    probe = code + "\nimport sys\nprint(','.join(m for m in ('cv2', 'numpy', 'skimage', 'scipy') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=PROJECT_ROOT,
+                         check=True, capture_output=True, text=True).stdout.strip()
+    return out or "-"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure interpreter + import startup cost.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<36} {'median ms':>10}  heavy modules loaded")
+    for name, code in CASES.items():
+        ms = time_case(code, args.repeat) * 1000
+        print(f"{name:<36} {ms:>10.1f}  {heavy_modules_after(code)}")
@@ -8,6 +8,25 @@ DB_PATH = os.path.join(PROJECT_ROOT, "data", "output", "bubble_info.db")
 # Make sure folder exists
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+# Precision of approximate (sampled) zone metrics; NULL for exact runs.
+# *_ci columns hold the confidence-interval half-width of the matching average.
+PRECISION_COLUMNS = [
+    ("avg_small_count_ci", "REAL"),
+    ("avg_medium_count_ci", "REAL"),
+    ("avg_large_count_ci", "REAL"),
+    ("avg_small_velocity_ci", "REAL"),
+    ("avg_medium_velocity_ci", "REAL"),
+    ("avg_large_velocity_ci", "REAL"),
+    ("ci_confidence", "REAL"),
+    ("count_frames_sampled", "INTEGER"),
+    ("count_frames_total", "INTEGER"),
+    ("velocity_pairs_sampled", "INTEGER"),
+    ("velocity_pairs_total", "INTEGER"),
+    # visited but not in the average (unreadable frames, pairs without small bubbles)
+    ("count_frames_excluded", "INTEGER"),
+    ("velocity_pairs_excluded", "INTEGER"),
+]
+
 def create_tables():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -35,6 +54,13 @@ def create_tables():
         )
     """)
 
+    # Add precision columns to databases created before they existed
+    cursor.execute("PRAGMA table_info(zone_metrics)")
+    existing = {row[1] for row in cursor.fetchall()}
+    for column, column_type in PRECISION_COLUMNS:
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE zone_metrics ADD COLUMN {column} {column_type}")
+
     conn.commit()
     conn.close()
 
@@ -55,21 +81,35 @@ def insert_run(run_name):
 
 def insert_zone_metrics(run_id, run_name, zone_name,
                         avg_small_count, avg_medium_count, avg_large_count,
-                        avg_small_velocity, avg_medium_velocity, avg_large_velocity):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+                        avg_small_velocity, avg_medium_velocity, avg_large_velocity,
+                        precision=None):
+    """
+    precision: optional {column: value} for PRECISION_COLUMNS, recorded
+    when the averages come from sampled (approximate) analysis.
+    """
+    precision = precision or {}
+    unknown = set(precision) - {column for column, _ in PRECISION_COLUMNS}
+    if unknown:
+        raise ValueError(f"Unknown precision columns: {sorted(unknown)}")
 
-    cursor.execute("""
-        INSERT INTO zone_metrics (
-            run_id, run_name, zone_name,
-            avg_small_count, avg_medium_count, avg_large_count,
-            avg_small_velocity, avg_medium_velocity, avg_large_velocity
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
+    columns = [
+        "run_id", "run_name", "zone_name",
+        "avg_small_count", "avg_medium_count", "avg_large_count",
+        "avg_small_velocity", "avg_medium_velocity", "avg_large_velocity",
+    ] + list(precision)
+    values = [
         run_id, run_name, zone_name,
         avg_small_count, avg_medium_count, avg_large_count,
-        avg_small_velocity, avg_medium_velocity, avg_large_velocity
-    ))
+        avg_small_velocity, avg_medium_velocity, avg_large_velocity,
+    ] + list(precision.values())
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute(
+        f"INSERT INTO zone_metrics ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        values
+    )
 
     conn.commit()
     conn.close()
@@ -1,8 +1,13 @@
 import os
-import cv2
-import numpy as np
 from pathlib import Path
 
+from src.lazy_imports import lazy_import
+from src.sampling.adaptive_sampling import RunningEstimate, stratified_order
+
+# Heavy dependencies are imported on first use
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
 # =========================
 # Utility Functions
 # =========================
@@ -39,27 +44,41 @@ def classify_bubbles(circles):
             large_bubbles.append(circle)
     return small_bubbles, medium_bubbles, large_bubbles
 
+def count_bubbles_in_frame(frame):
+    """Return (small, medium, large) bubble counts for one grayscale circles frame."""
+    circles = detect_filled_black_circles(frame)
+    small_bubbles, medium_bubbles, large_bubbles = classify_bubbles(circles)
+    return len(small_bubbles), len(medium_bubbles), len(large_bubbles)
+
 #===================================
 # Bubble Detection in a Zone
 #===================================
-def detect_bubbles_in_zone(zone_path):
+def list_zone_images(zone_path, image_files=None):
+    """
+    PNG images of a zone folder in name order. image_files: names already
+    listed (e.g. from FrameManifest.files) to skip the directory scan.
+    """
+    if image_files is None:
+        return sorted(Path(zone_path).glob("*.png"))
+    return [Path(zone_path) / name for name in image_files]
+
+def detect_bubbles_in_zone(zone_path, image_files=None):
     """
     Detect bubbles in all PNG images inside a zone folder.
     Returns the average small, medium, and large bubble counts.
     """
     all_small_counts, all_medium_counts, all_large_counts = [], [], []
 
-    for image_file in sorted(Path(zone_path).glob("*.png")):
+    for image_file in list_zone_images(zone_path, image_files):
         frame = cv2.imread(str(image_file), cv2.IMREAD_GRAYSCALE)
         if frame is None:
             continue
 
-        circles = detect_filled_black_circles(frame)
-        small_bubbles, medium_bubbles, large_bubbles = classify_bubbles(circles)
+        n_small, n_medium, n_large = count_bubbles_in_frame(frame)
 
-        all_small_counts.append(len(small_bubbles))
-        all_medium_counts.append(len(medium_bubbles))
-        all_large_counts.append(len(large_bubbles))
+        all_small_counts.append(n_small)
+        all_medium_counts.append(n_medium)
+        all_large_counts.append(n_large)
 
     avg_small_count = float(np.mean(all_small_counts)) if all_small_counts else 0.0
     avg_medium_count = float(np.mean(all_medium_counts)) if all_medium_counts else 0.0
@@ -68,6 +87,31 @@ def detect_bubbles_in_zone(zone_path):
     return avg_small_count, avg_medium_count, avg_large_count
 
 
+def estimate_bubbles_in_zone(zone_path, target_precision=0.05, confidence=0.95,
+                             min_samples=30, abs_tolerance=0.5, seed=None, image_files=None):
+    """
+    Approximate detect_bubbles_in_zone: visit frames in a randomised
+    stratified order and stop once the confidence interval of every size
+    class is within target_precision (relative) or abs_tolerance (bubbles).
+    Returns: (avg_small_count, avg_medium_count, avg_large_count), SamplingReport
+    """
+    image_files = list_zone_images(zone_path, image_files)
+    estimate = RunningEstimate(3, len(image_files), confidence)
+
+    for idx in stratified_order(len(image_files), seed=seed):
+        frame = cv2.imread(str(image_files[idx]), cv2.IMREAD_GRAYSCALE)
+        if frame is None:
+            estimate.exclude()
+        else:
+            estimate.add(count_bubbles_in_frame(frame))
+
+        if estimate.converged(target_precision, abs_tolerance, min_samples):
+            break
+
+    avg_counts = tuple(float(m) for m in estimate.mean) if estimate.n else (0.0, 0.0, 0.0)
+    return avg_counts, estimate.report()
+
+
 #def process_run_folder(run_folder_path):
     """
     Process a full run folder with multiple zones.
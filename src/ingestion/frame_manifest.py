@@ -0,0 +1,185 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = ".frame_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def numeric_order_key(name):
+    """Digit-extraction order used by the tracking stage (frame_12.png -> 12)."""
+    return int(''.join(filter(str.isdigit, name)) or -1)
+
+
+class FrameManifest:
+    """
+    Index of every file under one root folder, built by a parallel scandir
+    crawl and optionally persisted as <root>/.frame_manifest.json.
+
+    For each folder (keyed by its "/"-separated path relative to root, "" for
+    root) it records the folder mtime, its subfolders, and per file
+    [size, mtime_ns, numeric_order_key]. refresh() stats every folder but
+    only re-lists those whose mtime changed, and only stats the files that are
+    new in them, so picking up new frames costs the listing of the changed
+    folders, not a stat of every frame. Entries of known files are kept as
+    recorded; use refresh(full=True) for files rewritten in place.
+    """
+
+    def __init__(self, root, max_workers=16):
+        self.root = root
+        self.max_workers = max_workers
+        self.dirs = {}
+        self.dirty = False  # dirs changed since the last load()/save()
+
+    # -------------------------------
+    # Build / update
+    # -------------------------------
+    @classmethod
+    def open(cls, root, max_workers=16, save=True):
+        """Load the saved manifest of root (if any), bring it up to date and save it if it changed."""
+        manifest = cls(root, max_workers)
+        manifest.load()
+        manifest.refresh()
+        if save and manifest.dirty:
+            manifest.save()
+        return manifest
+
+    def _abs(self, rel_dir):
+        return os.path.join(self.root, *rel_dir.split("/")) if rel_dir else self.root
+
+    def _scan_dir(self, rel_dir, full):
+        path = self._abs(rel_dir)
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return rel_dir, None
+
+        cached = self.dirs.get(rel_dir)
+        if not full and cached is not None and cached["mtime_ns"] == dir_mtime:
+            return rel_dir, cached
+
+        known_files = {} if full or cached is None else cached["files"]
+        subdirs, files = [], {}
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.name in known_files:
+                        files[entry.name] = known_files[entry.name]
+                    elif entry.is_file() and entry.name != MANIFEST_NAME:
+                        st = entry.stat()
+                        files[entry.name] = [st.st_size, st.st_mtime_ns, numeric_order_key(entry.name)]
+                except FileNotFoundError:
+                    continue  # removed while scanning
+
+        return rel_dir, {"mtime_ns": dir_mtime, "subdirs": sorted(subdirs), "files": files}
+
+    def refresh(self, full=False):
+        """
+        Crawl root level by level, scanning each level's folders in parallel.
+        Returns the "/"-separated relative paths of files that are new since
+        the previous state.
+        """
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"[ERROR] Folder not found: {self.root}")
+
+        previous = self.dirs
+        updated = {}
+        frontier = [""]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while frontier:
+                next_frontier = []
+                for rel_dir, entry in pool.map(lambda d: self._scan_dir(d, full), frontier):
+                    if entry is None:
+                        continue
+                    updated[rel_dir] = entry
+                    next_frontier.extend(f"{rel_dir}/{s}" if rel_dir else s for s in entry["subdirs"])
+                frontier = next_frontier
+
+        new_files = []
+        for rel_dir, entry in updated.items():
+            old_files = previous.get(rel_dir, {}).get("files", {})
+            new_files.extend(
+                f"{rel_dir}/{name}" if rel_dir else name
+                for name in sorted(entry["files"]) if name not in old_files
+            )
+
+        # Only listing changes need saving: a folder mtime alone also moves when
+        # save() writes the manifest into root, which would re-save every run
+        if updated.keys() != previous.keys() or any(
+            entry["subdirs"] != previous[d]["subdirs"] or entry["files"] != previous[d]["files"]
+            for d, entry in updated.items() if entry is not previous[d]
+        ):
+            self.dirty = True
+        self.dirs = updated
+        return new_files
+
+    # -------------------------------
+    # Persistence
+    # -------------------------------
+    @property
+    def path(self):
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def load(self):
+        """Load the saved manifest; an unreadable or outdated file is ignored (full crawl)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        if data.get("version") != MANIFEST_VERSION:
+            return False
+        self.dirs = data["dirs"]
+        self.dirty = False
+        return True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "dirs": self.dirs}, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    # -------------------------------
+    # Queries (replace os.listdir / os.walk in the stages)
+    # -------------------------------
+    def subdirs(self, rel_dir=""):
+        """Sorted names of the folders directly inside rel_dir."""
+        return list(self.dirs.get(rel_dir, {}).get("subdirs", []))
+
+    def files(self, rel_dir="", exts=None, order="name"):
+        """
+        Names of the files directly inside rel_dir, optionally filtered by
+        (lower-case) extension. order="name" sorts like sorted(os.listdir);
+        order="numeric" sorts like the tracking stage (digit extraction).
+        """
+        files = self.dirs.get(rel_dir, {}).get("files", {})
+        names = sorted(n for n in files if exts is None or n.lower().endswith(exts))
+        if order == "numeric":
+            names.sort(key=lambda n: files[n][2])
+        return names
+
+    def walk_files(self, rel_dir="", exts=None):
+        """
+        Paths (relative to rel_dir, os.sep-separated) of every file below
+        rel_dir, in sorted(os.walk) + sorted(files) order.
+        """
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        # sorted(os.walk) compares the full folder paths, i.e. joined with os.sep
+        folders = sorted(
+            (d for d in self.dirs if d == rel_dir or d.startswith(prefix)),
+            key=lambda d: d.replace("/", os.sep)
+        )
+
+        paths = []
+        for d in folders:
+            sub = d[len(prefix):] if d != rel_dir else ""
+            for name in self.files(d, exts):
+                paths.append(os.path.join(*sub.split("/"), name) if sub else name)
+        return paths
+
+    def abspath(self, rel_path):
+        return os.path.join(self.root, *rel_path.split("/"))
@@ -1,5 +1,13 @@
 import os
-import cv2
+import tarfile
+import tempfile
+import zipfile
+
+from src.lazy_imports import lazy_import
+
+# Heavy dependencies are imported on first use
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 # ZONES are defined on the resized image (width=1000, height=600)
 ZONES = {
@@ -10,83 +18,250 @@ ZONES = {
 }
 
 ALLOWED_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff')
+ARCHIVE_EXTS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+COMPRESSED_TAR_EXTS = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Compressed tars are read front to back; members stored ahead of their turn
+# are held in memory up to this many bytes, and in a temporary file beyond it
+ARCHIVE_HOLD_BYTES = 256 * 1024 * 1024
+
+# -------------------------------
+# Input sources: folders and zip/tar archives
+# -------------------------------
+def is_archive(path):
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_EXTS)
 
-def process_one_input_folder(input_folder_path, processed_root, crop_coords, final_resize_dim):
+def input_base_name(input_path):
+    """Folder name, or archive file name without its (double) extension."""
+    name = os.path.basename(input_path.rstrip(os.sep))
+    if is_archive(input_path):
+        for ext in sorted(ARCHIVE_EXTS, key=len, reverse=True):
+            if name.lower().endswith(ext):
+                return name[:-len(ext)]
+    return name
+
+def decode_image_bytes(data):
+    """Decode an encoded image held in memory (BGR, like cv2.imread). None if unreadable."""
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+def read_tar_members_in_order(archive, members, ordered_names, hold_bytes=ARCHIVE_HOLD_BYTES):
     """
-    Process all images under input_folder_path (walks subfolders).
-    Creates: processed_root/<input_folder_name>_preprocessed/{SU,SL,TM,UR}/
-    Saves zone images with names: 00001_relpathfilename.jpg
+    Yield (name, data) for ordered_names while reading the tar strictly
+    forward (stored order), so a compressed stream is decompressed once
+    instead of restarting for every backward seek. Members stored ahead of
+    their turn are held until then: in memory up to hold_bytes, beyond that
+    in an anonymous temporary file.
     """
-    x1, x2, y1, y2 = crop_coords
-    folder_name = os.path.basename(input_folder_path.rstrip(os.sep))
-    out_base = os.path.join(processed_root, f"{folder_name}_preprocessed")
+    rank = {name: i for i, name in enumerate(ordered_names)}
+    held = {}          # rank -> (name, bytes) or (name, (offset, size)) in spill
+    held_in_memory = 0
+    spill = None
+    next_rank = 0
 
-    # create zone subfolders
-    for z in ZONES:
-        os.makedirs(os.path.join(out_base, z), exist_ok=True)
+    def release(r):
+        nonlocal held_in_memory
+        name, data = held.pop(r)
+        if isinstance(data, tuple):
+            offset, size = data
+            spill.seek(offset)
+            return name, spill.read(size)
+        held_in_memory -= len(data or b"")
+        return name, data
+
+    try:
+        for member in sorted((members[n] for n in ordered_names), key=lambda m: m.offset):
+            f = archive.extractfile(member)
+            data = f.read() if f is not None else None
+            r = rank[member.name]
+
+            if r != next_rank:
+                if data is not None and held_in_memory + len(data) > hold_bytes:
+                    if spill is None:
+                        spill = tempfile.TemporaryFile()
+                    spill.seek(0, os.SEEK_END)
+                    held[r] = (member.name, (spill.tell(), len(data)))
+                    spill.write(data)
+                else:
+                    held[r] = (member.name, data)
+                    held_in_memory += len(data or b"")
+                continue
+
+            yield member.name, data
+            next_rank += 1
+            while next_rank in held:
+                yield release(next_rank)
+                next_rank += 1
+    finally:
+        if spill is not None:
+            spill.close()
+
+def iter_archive_images(archive_path):
+    """
+    Yield (rel, label, img) for every image member of a zip/tar archive,
+    decoded straight from the member bytes (nothing is extracted to disk).
+    Members come in the same order sorted(os.walk) + sorted(files) would give
+    after unpacking, and a single top-level folder named like the archive
+    (e.g. run1.zip -> run1/...) is dropped from rel, as if unpacked into it.
+    Zip and plain .tar members are read by random access; compressed tars
+    are read front to back (see read_tar_members_in_order).
+    """
+    base_name = input_base_name(archive_path)
+
+    if zipfile.is_zipfile(archive_path):
+        archive = zipfile.ZipFile(archive_path)
+        members = {m.filename: m for m in archive.infolist() if not m.is_dir()}
+        read_member = lambda name: archive.read(members[name])
+    else:
+        archive = tarfile.open(archive_path, "r:*")
+        members = {m.name: m for m in archive.getmembers() if m.isfile()}
+
+        def read_member(name):
+            f = archive.extractfile(members[name])
+            return f.read() if f is not None else None
+
+    with archive:
+        names = [n for n in members if n.lower().endswith(ALLOWED_EXTS)]
+
+        prefix = base_name + "/"
+        strip_prefix = bool(names) and all(n.startswith(prefix) for n in names)
+
+        def rel_of(name):
+            rel = name[len(prefix):] if strip_prefix else name
+            return rel.lstrip("/").replace("/", os.sep)
+
+        # sorted(os.walk) orders by folder path, then sorted(files) by name
+        def walk_order(name):
+            rel = rel_of(name)
+            return os.path.dirname(rel), os.path.basename(rel)
+
+        ordered_names = sorted(names, key=walk_order)
+        if isinstance(archive, tarfile.TarFile) and archive_path.lower().endswith(COMPRESSED_TAR_EXTS):
+            member_data = read_tar_members_in_order(archive, members, ordered_names)
+        else:
+            member_data = ((name, read_member(name)) for name in ordered_names)
+
+        for name, data in member_data:
+            yield rel_of(name), f"{archive_path}:{name}", decode_image_bytes(data)
+
+def iter_input_images(input_path, rel_paths=None):
+    """
+    Yield (rel, label, img) for every image of an input folder (walks
+    subfolders) or zip/tar archive, in the order frames are numbered.
+    rel is the image path relative to the input; img is None if unreadable.
+    rel_paths: already-listed folder contents in walk order (e.g. from
+    FrameManifest.walk_files), so the folder is not walked again.
+    """
+    if is_archive(input_path):
+        yield from iter_archive_images(input_path)
+        return
+
+    if rel_paths is not None:
+        for rel in rel_paths:
+            in_path = os.path.join(input_path, rel)
+            yield rel, in_path, cv2.imread(in_path)
+        return
 
-    counter = 1
     # Walk the folder so images inside nested subfolders are also processed
-    for root, _, files in sorted(os.walk(input_folder_path)):
+    for root, _, files in sorted(os.walk(input_path)):
         for fname in sorted(files):
             if not fname.lower().endswith(ALLOWED_EXTS):
                 continue
 
             in_path = os.path.join(root, fname)
-            # build a relative-name-safe base for output filename
-            rel = os.path.relpath(in_path, input_folder_path)                 # e.g. "sub1/frame001.jpg"
-            rel_base = os.path.splitext(rel)[0].replace(os.sep, '__')        # e.g. "sub1__frame001"
+            rel = os.path.relpath(in_path, input_path)                         # e.g. "sub1/frame001.jpg"
+            yield rel, in_path, cv2.imread(in_path)
 
-            img = cv2.imread(in_path)
-            if img is None:
-                print(f"[WARN] Could not read image: {in_path}. Skipping.")
-                continue
 
-            h, w = img.shape[:2]
-            # clamp crop coordinates to image bounds
-            x1c = max(0, min(w, x1))
-            x2c = max(0, min(w, x2))
-            y1c = max(0, min(h, y1))
-            y2c = max(0, min(h, y2))
+def split_into_zones(img, crop_coords, final_resize_dim, label="image"):
+    """
+    Crop one full frame, resize it and cut it into ZONES.
+    Returns {zone_name: zone_img} (invalid/empty zones are left out),
+    or None when the whole frame has to be skipped.
+    """
+    x1, x2, y1, y2 = crop_coords
 
-            if x1c >= x2c or y1c >= y2c:
-                print(f"[WARN] Invalid crop for {in_path} after clamping -> skipping.")
-                continue
+    h, w = img.shape[:2]
+    # clamp crop coordinates to image bounds
+    x1c = max(0, min(w, x1))
+    x2c = max(0, min(w, x2))
+    y1c = max(0, min(h, y1))
+    y2c = max(0, min(h, y2))
 
-            cropped = img[y1c:y2c, x1c:x2c]
-            if cropped.size == 0:
-                print(f"[WARN] Empty crop for {in_path} -> skipping.")
-                continue
+    if x1c >= x2c or y1c >= y2c:
+        print(f"[WARN] Invalid crop for {label} after clamping -> skipping.")
+        return None
 
-            try:
-                final_img = cv2.resize(cropped, final_resize_dim, interpolation=cv2.INTER_AREA)
-            except Exception as e:
-                print(f"[WARN] Resize failed for {in_path}: {e}. Skipping.")
-                continue
+    cropped = img[y1c:y2c, x1c:x2c]
+    if cropped.size == 0:
+        print(f"[WARN] Empty crop for {label} -> skipping.")
+        return None
+
+    try:
+        final_img = cv2.resize(cropped, final_resize_dim, interpolation=cv2.INTER_AREA)
+    except Exception as e:
+        print(f"[WARN] Resize failed for {label}: {e}. Skipping.")
+        return None
+
+    zone_images = {}
+    for zone_name, (zx1, zy1, zx2, zy2) in ZONES.items():
+        # clamp zone coords (shouldn't be necessary if final_resize_dim matches expectations)
+        fw, fh = final_resize_dim
+        zx1c = max(0, min(fw, zx1))
+        zx2c = max(0, min(fw, zx2))
+        zy1c = max(0, min(fh, zy1))
+        zy2c = max(0, min(fh, zy2))
 
-            # save each zone
-            for zone_name, (zx1, zy1, zx2, zy2) in ZONES.items():
-                # clamp zone coords (shouldn't be necessary if final_resize_dim matches expectations)
-                fw, fh = final_resize_dim
-                zx1c = max(0, min(fw, zx1))
-                zx2c = max(0, min(fw, zx2))
-                zy1c = max(0, min(fh, zy1))
-                zy2c = max(0, min(fh, zy2))
+        if zx1c >= zx2c or zy1c >= zy2c:
+            print(f"[WARN] Invalid zone {zone_name} for {label} -> skipping this zone.")
+            continue
+
+        zone_img = final_img[zy1c:zy2c, zx1c:zx2c]
+        if zone_img.size == 0:
+            print(f"[WARN] Empty zone {zone_name} for {label} -> skipping zone.")
+            continue
 
-                if zx1c >= zx2c or zy1c >= zy2c:
-                    print(f"[WARN] Invalid zone {zone_name} for {in_path} -> skipping this zone.")
-                    continue
+        zone_images[zone_name] = zone_img
+    return zone_images
 
-                zone_img = final_img[zy1c:zy2c, zx1c:zx2c]
-                if zone_img.size == 0:
-                    print(f"[WARN] Empty zone {zone_name} for {in_path} -> skipping zone.")
-                    continue
+def process_one_input_folder(input_folder_path, processed_root, crop_coords, final_resize_dim,
+                             rel_paths=None):
+    """
+    Process all images under input_folder_path (walks subfolders).
+    input_folder_path may also be a .zip/.tar(.gz/.bz2/.xz) archive, which is
+    read in place and named after the archive (run1.zip -> run1_preprocessed).
+    Creates: processed_root/<input_folder_name>_preprocessed/{SU,SL,TM,UR}/
+    Saves zone images with names: 00001_relpathfilename.jpg
+    rel_paths: optional pre-listed image paths (see iter_input_images).
+    """
+    folder_name = input_base_name(input_folder_path)
+    out_base = os.path.join(processed_root, f"{folder_name}_preprocessed")
+
+    # create zone subfolders
+    for z in ZONES:
+        os.makedirs(os.path.join(out_base, z), exist_ok=True)
+
+    counter = 1
+    for rel, label, img in iter_input_images(input_folder_path, rel_paths):
+        # build a relative-name-safe base for output filename
+        rel_base = os.path.splitext(rel)[0].replace(os.sep, '__')        # e.g. "sub1__frame001"
+
+        if img is None:
+            print(f"[WARN] Could not read image: {label}. Skipping.")
+            continue
+
+        zone_images = split_into_zones(img, crop_coords, final_resize_dim, label)
+        if zone_images is None:
+            continue
 
-                out_name = f"{counter:05d}_{rel_base}.jpg"
-                out_path = os.path.join(out_base, zone_name, out_name)
-                cv2.imwrite(out_path, zone_img)
+        # save each zone
+        for zone_name, zone_img in zone_images.items():
+            out_name = f"{counter:05d}_{rel_base}.jpg"
+            out_path = os.path.join(out_base, zone_name, out_name)
+            cv2.imwrite(out_path, zone_img)
 
-            counter += 1
+        counter += 1
 
     print(f"[INFO] Finished processing '{folder_name}'. Saved zones to: {out_base}")
 
@@ -112,7 +287,7 @@ if __name__ == "__main__":
 
     for child in sorted(os.listdir(INPUT_PARENT)):
         child_path = os.path.join(INPUT_PARENT, child)
-        if not os.path.isdir(child_path):
+        if not (os.path.isdir(child_path) or is_archive(child_path)):
             continue
         # skip a processed folder if present under data/test by name
         if child.lower().startswith("processed") or child.lower().endswith("_preprocessed"):
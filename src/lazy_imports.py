@@ -0,0 +1,26 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Placeholder for a heavy dependency (cv2, numpy, skimage...) that is only
+    imported the first time one of its attributes is used. Attributes are
+    cached on the placeholder, so later lookups cost the same as on the module.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_lazy_name"] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__["_lazy_name"])
+        value = getattr(module, attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self.__dict__['_lazy_name']}'>"
+
+
+def lazy_import(name):
+    """Return a LazyModule for `name` (e.g. np = lazy_import("numpy"))."""
+    return LazyModule(name)
@@ -0,0 +1,134 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from src.pipeline.worker import bootstrap
+
+EXECUTION_MODES = ("thread", "process", "hybrid")
+
+
+def process_start_context():
+    """
+    Start method for pool processes. Plain fork copies the parent mid-way
+    through whatever its other threads are doing (e.g. a thread-pool task
+    importing cv2), so workers come from a clean forkserver, or are spawned
+    where that is not available (Windows). Either way the children re-import
+    the main script, so entry points need an `if __name__ == "__main__":` guard.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+# -------------------------------
+# Thread budget helpers
+# -------------------------------
+def split_workers(mode, max_workers=None):
+    """
+    Decide pool sizes so that workers x library threads ~= number of cores.
+    In hybrid mode the two pools split the cores: detection + tracking run on
+    both at once, and stages that run alone use both via submit_balanced().
+    Returns: (n_thread_workers, n_process_workers, threads_per_worker)
+    """
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode '{mode}'. Expected one of {EXECUTION_MODES}")
+
+    cores = os.cpu_count() or 1
+    workers = max(1, max_workers or cores)
+
+    if mode == "thread":
+        n_threads, n_procs = workers, 0
+    elif mode == "process":
+        n_threads, n_procs = 0, workers
+    else:
+        # hybrid: both pools run at the same time and share the cores
+        n_procs = max(1, workers // 2)
+        n_threads = max(1, workers - n_procs)
+
+    threads_per_worker = max(1, cores // (n_threads + n_procs))
+    return n_threads, n_procs, threads_per_worker
+
+
+# -------------------------------
+# Execution backend
+# -------------------------------
+class ExecutionBackend:
+    """
+    Pair of executors used by the pipeline stages.
+
+    cv2_executor    -> stages dominated by OpenCV calls (ingestion, detection,
+                       video); cv2 releases the GIL so threads scale here.
+    python_executor -> stages dominated by Python loops (preprocessing's
+                       regionprops, tracking's matching); these need processes.
+
+    mode = "thread"  : one thread pool serves both
+    mode = "process" : one process pool serves both
+    mode = "hybrid"  : thread pool for cv2 stages, process pool for Python stages
+
+    Stages separated from the others by barriers (ingestion, preprocessing,
+    video) use submit_balanced(), which spreads their tasks over both pools
+    so none of the worker budget sits idle while they run.
+    """
+
+    def __init__(self, mode="hybrid", max_workers=None):
+        self.mode = mode
+        n_threads, n_procs, self.threads_per_worker = split_workers(mode, max_workers)
+        self.n_threads, self.n_procs = n_threads, n_procs
+
+        self._thread_pool = None
+        self._process_pool = None
+
+        # OpenCV/BLAS limits are process-wide: cap this process (thread pool)
+        # and let child processes inherit the same env vars at startup
+        bootstrap(self.threads_per_worker)
+
+        if n_threads:
+            self._thread_pool = ThreadPoolExecutor(max_workers=n_threads)
+
+        if n_procs:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=n_procs,
+                mp_context=process_start_context(),
+                initializer=bootstrap,
+                initargs=(self.threads_per_worker,),
+            )
+
+        self.cv2_executor = self._thread_pool or self._process_pool
+        self.python_executor = self._process_pool or self._thread_pool
+
+        # queued + running tasks per pool, for submit_balanced()
+        self._pool_sizes = [(pool, size) for pool, size in
+                            ((self._thread_pool, n_threads), (self._process_pool, n_procs)) if pool is not None]
+        self._outstanding = {id(pool): 0 for pool, _ in self._pool_sizes}
+        self._outstanding_lock = threading.Lock()
+
+        print(f"[INFO] Execution backend '{mode}': {n_threads} thread worker(s), "
+              f"{n_procs} process worker(s), {self.threads_per_worker} library thread(s) each")
+
+    def submit_balanced(self, fn, *args, **kwargs):
+        """
+        Submit to whichever pool has the least outstanding work per worker.
+        For stages that run on their own; fn and its arguments must be picklable.
+        """
+        with self._outstanding_lock:
+            pool, _ = min(self._pool_sizes, key=lambda ps: (self._outstanding[id(ps[0])] + 1) / ps[1])
+            self._outstanding[id(pool)] += 1
+
+        future = pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._task_done(pool))
+        return future
+
+    def _task_done(self, pool):
+        with self._outstanding_lock:
+            self._outstanding[id(pool)] -= 1
+
+    def shutdown(self, wait=True):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
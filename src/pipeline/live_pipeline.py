@@ -0,0 +1,255 @@
+import os
+import time
+import argparse
+from collections import deque
+
+import cv2
+import numpy as np
+
+# === Import per-frame helpers from each stage ===
+from src.ingestion.ingest_folders import ZONES, ALLOWED_EXTS, split_into_zones
+from src.ingestion.frame_manifest import FrameManifest
+from src.preprocessing.preprocessing import CANVAS_MODES, draw_circles_canvas, canvas_write_params
+from src.detection.detect_bubbles import count_bubbles_in_frame
+from src.tracking.vel_track import detect_frame_centroids, frame_pair_velocities
+from src.database.db_utils import create_tables, insert_run, insert_zone_metrics
+
+
+# ---------- Folder watcher (portable polling) ----------
+def walk_order_key(rel):
+    """Order of sorted(os.walk) + sorted(files) for a "/"-separated relative path."""
+    folder, _, name = rel.rpartition("/")
+    return folder.replace("/", os.sep), name
+
+
+def poll_new_frames(manifest, pending_sizes):
+    """
+    One polling pass over the manifest's root (in-memory FrameManifest).
+    manifest.refresh() only re-lists folders whose mtime changed and reports
+    files it has not seen before, so a pass does not grow with the number of
+    frames already processed; only new and still-pending frames are stat'ed.
+    A frame is only reported once its size is unchanged between two passes,
+    so files still being written by the camera software are not picked up.
+    Returns newly completed frames as (relative_path, mtime), in sorted order.
+    """
+    for rel in manifest.refresh():
+        if rel.lower().endswith(ALLOWED_EXTS):
+            pending_sizes[rel] = None
+
+    ready = []
+    for rel in sorted(pending_sizes, key=walk_order_key):
+        try:
+            st = os.stat(manifest.abspath(rel))
+        except OSError:
+            pending_sizes.pop(rel)  # removed before it was complete
+            continue
+
+        if st.st_size > 0 and pending_sizes[rel] == st.st_size:
+            pending_sizes.pop(rel)
+            ready.append((rel.replace("/", os.sep), st.st_mtime))
+        else:
+            pending_sizes[rel] = st.st_size
+    return ready
+
+
+# ---------- Incremental per-zone metrics ----------
+class LiveZoneMetrics:
+    """
+    Incremental tracking state for one zone.
+    Keeps rolling averages over the last `window` frames and running totals
+    averaged the same way as detect_bubbles_in_zone and
+    calculate_avg_velocities_from_folder. (Live zones skip the intermediate
+    JPEG write, so values can differ slightly from a batch run.)
+    """
+
+    def __init__(self, window=50):
+        self.prev_centroids = ([], [], [])
+        self.recent_counts = deque(maxlen=window)
+        self.recent_velocities = deque(maxlen=window)
+        self.total_counts = np.zeros(3)
+        self.total_velocities = [0, 0, 0]
+        self.n_frames = 0
+        self.n_pairs = 0
+
+    def update(self, canvas, fps, px_per_mm):
+        # Detection works on the grayscale canvas; tracking takes the canvas in either format
+        gray = cv2.cvtColor(canvas, cv2.COLOR_BGR2GRAY) if canvas.ndim == 3 else canvas
+        counts = count_bubbles_in_frame(gray)
+        self.recent_counts.append(counts)
+        self.total_counts += counts
+        self.n_frames += 1
+
+        centroids = detect_frame_centroids(canvas)
+        # previous frame must have small bubbles for the pair to count
+        if self.prev_centroids[0]:
+            vels = frame_pair_velocities(self.prev_centroids, centroids, fps, px_per_mm)
+            self.recent_velocities.append(vels)
+            self.total_velocities = [t + v for t, v in zip(self.total_velocities, vels)]
+            self.n_pairs += 1
+        self.prev_centroids = centroids
+
+    def rolling(self):
+        """Return (counts, velocities) averaged over the rolling window."""
+        counts = tuple(np.mean(self.recent_counts, axis=0)) if self.recent_counts else (0.0, 0.0, 0.0)
+        vels = tuple(np.mean(self.recent_velocities, axis=0)) if self.recent_velocities else (0, 0, 0)
+        return counts, vels
+
+    def cumulative(self):
+        """Return (counts, velocities) averaged over every frame seen so far."""
+        counts = tuple(float(c) for c in self.total_counts / self.n_frames) if self.n_frames else (0.0, 0.0, 0.0)
+        vels = tuple(t / self.n_pairs for t in self.total_velocities) if self.n_pairs else (0, 0, 0)
+        return counts, vels
+
+
+# ---------- One frame: crop -> zones -> preprocessing -> detection -> tracking ----------
+def process_live_frame(in_path, zone_metrics, crop_coords, final_resize_dim, fps, px_per_mm,
+                       out_base=None, out_prefix=None, canvas_mode="bilevel"):
+    """
+    Push one raw frame through every stage and update zone_metrics in place.
+    If out_base is given the circle canvases are also saved there, using the
+    same <out_base>/<zone>/<prefix>_cb_circles.png layout as the batch pipeline,
+    in the given canvas_mode.
+    Returns False if the frame had to be skipped.
+    """
+    img = cv2.imread(in_path)
+    if img is None:
+        print(f"[WARN] Could not read image: {in_path}. Skipping.")
+        return False
+
+    zone_images = split_into_zones(img, crop_coords, final_resize_dim, in_path)
+    if zone_images is None:
+        return False
+
+    for zone_name, zone_img in zone_images.items():
+        canvas = draw_circles_canvas(zone_img, canvas_mode=canvas_mode)
+        zone_metrics[zone_name].update(canvas, fps, px_per_mm)
+
+        if out_base is not None:
+            cv2.imwrite(os.path.join(out_base, zone_name, f"{out_prefix}_cb_circles.png"), canvas,
+                        canvas_write_params(canvas_mode))
+    return True
+
+
+def format_zone_summary(zone_name, metrics):
+    (n_s, n_m, n_l), (v_s, v_m, v_l) = metrics.rolling()
+    return f"{zone_name} n={n_s:.1f}/{n_m:.1f}/{n_l:.1f} v={v_s:.3f}/{v_m:.3f}/{v_l:.3f}"
+
+
+# ---------- Live orchestration ----------
+def run_live(incoming_dir, fps, px_per_mm, crop_coords, final_resize_dim,
+             run_name=None, preprocessed_root=None, poll_interval=0.2,
+             window=50, idle_timeout=None, store_results=True, canvas_mode="bilevel"):
+    """
+    Watch incoming_dir and process every new frame as soon as it is complete.
+    Prints per-frame latency and rolling small/medium/large counts and
+    velocities (m/s) for each zone. Stops on Ctrl+C, or after idle_timeout
+    seconds without new frames, and then stores the cumulative zone metrics.
+    """
+    if not os.path.isdir(incoming_dir):
+        raise SystemExit(f"[ERROR] Incoming folder does not exist: {incoming_dir}")
+
+    folder_name = os.path.basename(incoming_dir.rstrip(os.sep))
+    run_name = run_name or f"{folder_name}_live"
+
+    out_base = None
+    if preprocessed_root is not None:
+        out_base = os.path.join(preprocessed_root, run_name)
+        for z in ZONES:
+            os.makedirs(os.path.join(out_base, z), exist_ok=True)
+
+    zone_metrics = {z: LiveZoneMetrics(window) for z in ZONES}
+    # kept in memory only: nothing is written into the camera's folder
+    manifest = FrameManifest(incoming_dir, max_workers=4)
+    pending_sizes = {}
+    counter = 1
+    latencies = []
+    last_frame_time = time.monotonic()
+
+    print(f"[INFO] Live mode: watching {incoming_dir} (run '{run_name}'). Press Ctrl+C to stop.")
+    try:
+        while True:
+            poll_start = time.monotonic()
+            new_frames = poll_new_frames(manifest, pending_sizes)
+
+            for rel, mtime in new_frames:
+                t0 = time.perf_counter()
+                rel_base = os.path.splitext(rel)[0].replace(os.sep, '__')
+                ok = process_live_frame(
+                    os.path.join(incoming_dir, rel), zone_metrics,
+                    crop_coords, final_resize_dim, fps, px_per_mm,
+                    out_base, f"{counter:05d}_{rel_base}", canvas_mode
+                )
+                if not ok:
+                    continue
+
+                processing_ms = (time.perf_counter() - t0) * 1000
+                # end-to-end: file last written -> metrics updated
+                latency_ms = max(0.0, time.time() - mtime) * 1000
+                latencies.append(latency_ms)
+
+                summary = " | ".join(format_zone_summary(z, m) for z, m in zone_metrics.items())
+                print(f"[LIVE] {counter:05d} {rel} latency {latency_ms:.0f} ms "
+                      f"(processing {processing_ms:.1f} ms) | {summary}")
+                counter += 1
+
+            if new_frames:
+                last_frame_time = time.monotonic()
+            elif idle_timeout is not None and time.monotonic() - last_frame_time > idle_timeout:
+                print(f"[INFO] No new frames for {idle_timeout}s -> stopping live mode.")
+                break
+
+            time.sleep(max(0.0, poll_interval - (time.monotonic() - poll_start)))
+    except KeyboardInterrupt:
+        print("\n[INFO] Live mode stopped by user.")
+
+    if latencies:
+        print(f"[INFO] Processed {len(latencies)} frames. Latency median "
+              f"{np.median(latencies):.0f} ms, p95 {np.percentile(latencies, 95):.0f} ms")
+
+    if store_results and counter > 1:
+        run_id = insert_run(run_name)
+        for zone_name, metrics in zone_metrics.items():
+            (n_s, n_m, n_l), (v_s, v_m, v_l) = metrics.cumulative()
+            insert_zone_metrics(run_id, run_name, zone_name, n_s, n_m, n_l, v_s, v_m, v_l)
+        print(f"✅ Stored live results for {run_name}")
+
+    return zone_metrics
+
+
+# ---------- Main ----------
+if __name__ == "__main__":
+    # ✅ Google Drive root (same as run_pipeline.py)
+    gdrive_root = r"G:\Other computers\My Laptop\Documents\Bubble Vel Input"
+
+    parser = argparse.ArgumentParser(description="Process frames live as they land in a folder.")
+    parser.add_argument("--incoming", default=os.path.join(gdrive_root, "data", "incoming"),
+                        help="folder the camera writes frames into")
+    parser.add_argument("--run-name", default=None)
+    parser.add_argument("--fps", type=float, default=100)
+    parser.add_argument("--px-per-mm", type=float, default=4.58)
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="seconds between folder scans")
+    parser.add_argument("--window", type=int, default=50, help="frames in the rolling average")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="stop after this many seconds without new frames")
+    parser.add_argument("--save-canvases", action="store_true",
+                        help="also write circle canvases under data/preprocessed")
+    parser.add_argument("--canvas-mode", choices=CANVAS_MODES, default="bilevel",
+                        help="storage format of saved circle canvases")
+    args = parser.parse_args()
+
+    crop_coords = (390, 1700, 120, 960)
+    final_resize_dim = (1000, 600)
+
+    create_tables()
+
+    preprocessed_root = os.path.join(gdrive_root, "data", "preprocessed") if args.save_canvases else None
+
+    run_live(
+        args.incoming, args.fps, args.px_per_mm, crop_coords, final_resize_dim,
+        run_name=args.run_name,
+        preprocessed_root=preprocessed_root,
+        poll_interval=args.poll_interval,
+        window=args.window,
+        idle_timeout=args.idle_timeout,
+        canvas_mode=args.canvas_mode,
+    )
@@ -1,55 +1,168 @@
 import os
 import shutil
-from concurrent.futures import ProcessPoolExecutor
+from collections import namedtuple
 
 # === Import functions from each stage ===
-from src.ingestion.ingest_folders import process_one_input_folder
+from src.ingestion.ingest_folders import process_one_input_folder, is_archive, ALLOWED_EXTS
+from src.ingestion.frame_manifest import FrameManifest
 from src.preprocessing.preprocessing import process_image
 from src.database.db_utils import create_tables, insert_run, insert_zone_metrics
-from src.detection.detect_bubbles import detect_bubbles_in_zone
-from src.tracking.vel_track import calculate_avg_velocities_from_folder
+from src.detection.detect_bubbles import detect_bubbles_in_zone, estimate_bubbles_in_zone
+from src.tracking.vel_track import (
+    list_frame_files, split_frame_chunks, track_frame_chunk, merge_chunk_velocities,
+    estimate_avg_velocities_from_folder
+)
 from src.video_processing.video_processing import create_video_from_images
+from src.pipeline.executors import ExecutionBackend
 
 
 # ---------- Stage 3: Detection + Tracking ----------
-def process_zone(run_id, run_name, zone_path, fps, px_per_mm):
-    zone_name = os.path.basename(zone_path)
-
-    with ProcessPoolExecutor(max_workers=2) as executor:
-        future_detection = executor.submit(detect_bubbles_in_zone, zone_path)
-        future_tracking = executor.submit(
-            calculate_avg_velocities_from_folder,
+# Futures of one submitted zone. Exact mode: tracking is a list of chunk futures.
+PendingZone = namedtuple("PendingZone", ["detection", "tracking", "approximate", "fps", "px_per_mm"])
+
+
+def submit_zone(zone_path, fps, px_per_mm, backend, target_precision=None, chunk_size=250,
+                image_files=None, frame_files=None, detection=None):
+    """
+    Queue detection (cv2-heavy) and tracking (Python-heavy) for one zone.
+    Exact tracking is split into chunks of chunk_size frames so a long zone
+    spreads over all workers; store_zone_results merges them exactly.
+    With target_precision set, both stages sample frames and stop early
+    (approximate mode) instead of processing every frame.
+    image_files / frame_files: the zone's PNGs in name order / frames in
+    numeric order (from a FrameManifest); listed from disk when None.
+    detection: an already-submitted detection future to reuse (counts do not
+    depend on fps / px_per_mm, so re-analyses of a zone can share it).
+    """
+    if frame_files is None:
+        frame_files = list_frame_files(zone_path)
+
+    future_detection = detection
+    if target_precision is None:
+        if future_detection is None:
+            future_detection = backend.cv2_executor.submit(detect_bubbles_in_zone, zone_path, image_files)
+        future_tracking = [
+            backend.python_executor.submit(track_frame_chunk, zone_path, chunk, fps, px_per_mm)
+            for chunk in split_frame_chunks(frame_files, chunk_size)
+        ]
+    else:
+        if future_detection is None:
+            future_detection = backend.cv2_executor.submit(
+                estimate_bubbles_in_zone, zone_path, target_precision=target_precision, image_files=image_files
+            )
+        future_tracking = backend.python_executor.submit(
+            estimate_avg_velocities_from_folder,
             zone_path,
             fps,
-            px_per_mm
+            px_per_mm,
+            target_precision=target_precision,
+            frame_files=frame_files
+        )
+    return PendingZone(future_detection, future_tracking, target_precision is not None, fps, px_per_mm)
+
+
+def build_precision_columns(count_report, velocity_report):
+    """Map the two SamplingReports onto db_utils.PRECISION_COLUMNS."""
+    small_count_ci, medium_count_ci, large_count_ci = count_report.half_widths
+    small_vel_ci, medium_vel_ci, large_vel_ci = velocity_report.half_widths
+    return {
+        "avg_small_count_ci": small_count_ci,
+        "avg_medium_count_ci": medium_count_ci,
+        "avg_large_count_ci": large_count_ci,
+        "avg_small_velocity_ci": small_vel_ci,
+        "avg_medium_velocity_ci": medium_vel_ci,
+        "avg_large_velocity_ci": large_vel_ci,
+        "ci_confidence": count_report.confidence,
+        "count_frames_sampled": count_report.n_sampled,
+        "count_frames_total": count_report.n_total,
+        "velocity_pairs_sampled": velocity_report.n_sampled,
+        "velocity_pairs_total": velocity_report.n_total,
+        "count_frames_excluded": count_report.n_excluded,
+        "velocity_pairs_excluded": velocity_report.n_excluded,
+    }
+
+
+def store_zone_results(run_id, run_name, zone_name, pending):
+    """Wait for a submitted zone, store its metrics and return them as {column: value}."""
+    precision = None
+    if pending.approximate:
+        (avg_small_count, avg_medium_count, avg_large_count), count_report = pending.detection.result()
+        (avg_small_vel, avg_medium_vel, avg_large_vel), velocity_report = pending.tracking.result()
+        precision = build_precision_columns(count_report, velocity_report)
+    else:
+        avg_small_count, avg_medium_count, avg_large_count = pending.detection.result()
+        avg_small_vel, avg_medium_vel, avg_large_vel = merge_chunk_velocities(
+            [f.result() for f in pending.tracking], pending.fps, pending.px_per_mm
         )
-
-        avg_small_count, avg_medium_count, avg_large_count = future_detection.result()
-        avg_small_vel, avg_medium_vel, avg_large_vel = future_tracking.result()
 
     # Store results
     insert_zone_metrics(
         run_id, run_name, zone_name,
         avg_small_count, avg_medium_count, avg_large_count,
-        avg_small_vel, avg_medium_vel, avg_large_vel
+        avg_small_vel, avg_medium_vel, avg_large_vel,
+        precision=precision
     )
 
-    print(f"✅ Stored results for {run_name} - {zone_name}")
+    if pending.approximate:
+        print(f"✅ Stored results for {run_name} - {zone_name} "
+              f"(used {count_report.n_sampled}/{count_report.n_total} frames, "
+              f"{velocity_report.n_sampled}/{velocity_report.n_total} pairs; "
+              f"excluded {count_report.n_excluded} frames, {velocity_report.n_excluded} pairs)")
+    else:
+        print(f"✅ Stored results for {run_name} - {zone_name}")
+
+    metrics = {
+        "avg_small_count": float(avg_small_count),
+        "avg_medium_count": float(avg_medium_count),
+        "avg_large_count": float(avg_large_count),
+        "avg_small_velocity": float(avg_small_vel),
+        "avg_medium_velocity": float(avg_medium_vel),
+        "avg_large_velocity": float(avg_large_vel),
+    }
+    metrics.update(precision or {})
+    return metrics
+
+
+def process_zone(run_id, run_name, zone_path, fps, px_per_mm, backend, target_precision=None,
+                 chunk_size=250):
+    zone_name = os.path.basename(zone_path)
+    pending = submit_zone(zone_path, fps, px_per_mm, backend, target_precision, chunk_size)
+    store_zone_results(run_id, run_name, zone_name, pending)
 
 
-def process_run(run_folder_path, fps, px_per_mm):
+def process_run(run_folder_path, fps, px_per_mm, backend, target_precision=None, chunk_size=250,
+                manifest=None):
+    """manifest: FrameManifest of the folder holding run_folder_path (skips directory scans)."""
     run_name = os.path.basename(run_folder_path)
     run_id = insert_run(run_name)
 
-    zone_folders = sorted(os.listdir(run_folder_path))
+    if manifest is not None:
+        zone_folders = manifest.subdirs(run_name)
+    else:
+        zone_folders = [z for z in sorted(os.listdir(run_folder_path))
+                        if os.path.isdir(os.path.join(run_folder_path, z))]
+
+    # Submit every zone first so the pools stay busy, then collect in order
+    pending = []
     for zone_folder in zone_folders:
         zone_path = os.path.join(run_folder_path, zone_folder)
-        if os.path.isdir(zone_path):
-            process_zone(run_id, run_name, zone_path, fps, px_per_mm)
+        image_files = frame_files = None
+        if manifest is not None:
+            rel_zone = f"{run_name}/{zone_folder}"
+            image_files = manifest.files(rel_zone, (".png",))
+            frame_files = manifest.files(rel_zone, (".png", ".jpg", ".jpeg"), order="numeric")
+
+        pending.append((zone_folder, submit_zone(
+            zone_path, fps, px_per_mm, backend, target_precision, chunk_size, image_files, frame_files
+        )))
+
+    for zone_folder, pending_zone in pending:
+        store_zone_results(run_id, run_name, zone_folder, pending_zone)
 
 
 # ---------- Stage 1 + Stage 2: Ingestion & Preprocessing ----------
-def run_ingestion_and_preprocessing(gdrive_root):
+def run_ingestion_and_preprocessing(gdrive_root, backend, canvas_mode="bilevel"):
+    """canvas_mode: how circle canvases are stored (see preprocessing.CANVAS_MODES)."""
     # Stage 1: Ingestion (inputs from Google Drive)
     input_parent = os.path.join(gdrive_root, "data", "raw")
 
@@ -68,27 +181,41 @@ def run_ingestion_and_preprocessing(gdrive_root):
     if not os.path.isdir(input_parent):
         raise SystemExit(f"[ERROR] Input parent folder does not exist: {input_parent}")
 
-    # Ingestion
-    for child in sorted(os.listdir(input_parent)):
+    # One parallel crawl of the raw inputs, saved and updated incrementally between runs
+    raw_manifest = FrameManifest.open(input_parent)
+
+    # Ingestion (one task per input folder or archive; each numbers its own frames)
+    archives = [f for f in raw_manifest.files() if is_archive(os.path.join(input_parent, f))]
+    ingestion_futures = []
+    for child in sorted(raw_manifest.subdirs() + archives):
         child_path = os.path.join(input_parent, child)
-        if not os.path.isdir(child_path):
-            continue
         if child.lower().startswith("processed") or child.lower().endswith("_preprocessed"):
             continue
 
+        rel_paths = raw_manifest.walk_files(child, ALLOWED_EXTS) if child in raw_manifest.dirs else None
+
         print(f"\n[INFO] Ingestion: {child}")
-        process_one_input_folder(child_path, processed_root, crop_coords, final_resize_dim)
+        ingestion_futures.append(backend.submit_balanced(
+            process_one_input_folder, child_path, processed_root, crop_coords, final_resize_dim, rel_paths
+        ))
+
+    for future in ingestion_futures:
+        future.result()
 
-    # Preprocessing + Video Creation
-    for folder in sorted(os.listdir(processed_root)):
+    # Temporary folder: crawled once in memory, not saved
+    processed_manifest = FrameManifest(processed_root)
+    processed_manifest.refresh()
+
+    # Frames already present from earlier runs still go into the zone videos
+    cleaned_manifest = FrameManifest.open(cleaned_root)
+
+    # Preprocessing (one task per image), then one video per finished zone
+    zone_jobs = []
+    for folder in processed_manifest.subdirs():
         folder_path = os.path.join(processed_root, folder)
-        if not os.path.isdir(folder_path):
-            continue
 
-        for zone in sorted(os.listdir(folder_path)):
+        for zone in processed_manifest.subdirs(folder):
             zone_path = os.path.join(folder_path, zone)
-            if not os.path.isdir(zone_path):
-                continue
 
             output_zone_path = os.path.join(cleaned_root, folder, zone)
             os.makedirs(output_zone_path, exist_ok=True)
@@ -97,19 +224,34 @@ def run_ingestion_and_preprocessing(gdrive_root):
             os.makedirs(video_output_folder, exist_ok=True)
             video_output_path = os.path.join(video_output_folder, f"{zone}.avi")
 
-            for img_file in sorted(os.listdir(zone_path)):
-                if not img_file.lower().endswith((".png", ".jpg", ".jpeg")):
-                    continue
-
+            image_futures = []
+            circles_files = []
+            for img_file in processed_manifest.files(f"{folder}/{zone}", (".png", ".jpg", ".jpeg")):
                 img_path = os.path.join(zone_path, img_file)
                 base_name, _ = os.path.splitext(img_file)
                 circles_path = os.path.join(output_zone_path, f"{base_name}_cb_circles.png")
+                circles_files.append(os.path.basename(circles_path))
+
+                image_futures.append(backend.submit_balanced(
+                    process_image, img_path, circles_path, canvas_mode=canvas_mode
+                ))
+
+            existing_files = cleaned_manifest.files(f"{folder}/{zone}", (".jpg", ".jpeg", ".png"))
+            video_files = sorted(set(existing_files) | set(circles_files))
+            zone_jobs.append((output_zone_path, video_output_path, image_futures, video_files))
 
-                process_image(img_path, circles_path)
+    # ✅ Create video after preprocessing all zone images
+    video_futures = []
+    for output_zone_path, video_output_path, image_futures, video_files in zone_jobs:
+        for future in image_futures:
+            future.result()
+        video_futures.append((video_output_path, backend.submit_balanced(
+            create_video_from_images, output_zone_path, video_output_path, image_files=video_files
+        )))
 
-            # ✅ Create video after preprocessing all zone images
-            create_video_from_images(output_zone_path, video_output_path)
-            print(f"[INFO] Video saved: {video_output_path}")
+    for video_output_path, future in video_futures:
+        future.result()
+        print(f"[INFO] Video saved: {video_output_path}")
 
     return processed_root, cleaned_root, videos_root
 
@@ -122,19 +264,39 @@ if __name__ == "__main__":
     fps = 100
     px_per_mm = 4.58
 
+    # "thread", "process" or "hybrid" (see src/pipeline/executors.py)
+    execution_mode = "hybrid"
+    max_workers = None  # None -> one worker per core
+
+    # None -> analyse every frame; e.g. 0.05 -> sample until averages are within ±5% (quick-look)
+    target_precision = None
+
+    # frames per tracking task; long zones are tracked in parallel chunks and merged exactly
+    tracking_chunk_size = 250
+
+    # circle canvases: "bilevel" (1-bit PNG), "gray" (8-bit PNG) or "color" (legacy 3-channel).
+    # gray files are slightly smaller and quicker to write, but every canvas is decoded
+    # 2-3 times (detection, tracking, video) and bilevel decodes about 2x faster
+    canvas_mode = "bilevel"
+
     # Make sure DB tables exist (stored locally)
     create_tables()
 
     print("===== Starting Full Orchestration Pipeline =====")
 
-    # Step 1 & 2: Ingestion + Preprocessing (Google Drive)
-    processed_root, preprocessed_base, videos_root = run_ingestion_and_preprocessing(gdrive_root)
+    with ExecutionBackend(execution_mode, max_workers) as backend:
+        # Step 1 & 2: Ingestion + Preprocessing (Google Drive)
+        processed_root, preprocessed_base, videos_root = run_ingestion_and_preprocessing(
+            gdrive_root, backend, canvas_mode
+        )
 
-    # Step 3: Detection + Tracking (read from Google Drive, store results in DB locally)
-    for run_folder in sorted(os.listdir(preprocessed_base)):
-        run_folder_path = os.path.join(preprocessed_base, run_folder)
-        if os.path.isdir(run_folder_path):
-            process_run(run_folder_path, fps, px_per_mm)
+        # Step 3: Detection + Tracking (read from Google Drive, store results in DB locally)
+        # Manifest is saved next to the outputs; later runs only rescan changed folders
+        preprocessed_manifest = FrameManifest.open(preprocessed_base)
+        for run_folder in preprocessed_manifest.subdirs():
+            run_folder_path = os.path.join(preprocessed_base, run_folder)
+            process_run(run_folder_path, fps, px_per_mm, backend, target_precision, tracking_chunk_size,
+                        manifest=preprocessed_manifest)
 
     print("===== Pipeline Completed =====")
 
@@ -0,0 +1,51 @@
+"""
+Lightweight entry points for pool worker processes.
+
+Nothing heavy is imported here: a worker only loads cv2 / numpy / skimage
+when the stage function it runs first touches them (stage modules import
+them lazily), so detection and tracking workers never pay for skimage.
+"""
+import os
+import sys
+import importlib
+
+# Read by OpenCV / BLAS / OpenMP runtimes when they initialise in a process
+THREAD_ENV_VARS = (
+    "OPENCV_FOR_THREADS_NUM",
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def bootstrap(n_threads):
+    """
+    Pool initializer: cap OpenCV and BLAS threads without importing them.
+    Libraries that load later read the env vars; ones already fully loaded
+    (e.g. inherited through fork) are capped directly. A module that is in
+    sys.modules but only partly initialised (forked mid-import) is left to
+    the env vars.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+
+    set_num_threads = getattr(sys.modules.get("cv2"), "setNumThreads", None)
+    if set_num_threads is not None:
+        set_num_threads(n_threads)
+
+    if getattr(sys.modules.get("numpy"), "ndarray", None) is not None:
+        # BLAS is already loaded; threadpoolctl can still resize it
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(n_threads)
+        except ImportError:
+            pass
+
+
+def warm_up(module_names=("cv2", "numpy")):
+    """Import modules ahead of the first task (e.g. for long-lived workers)."""
+    for name in module_names:
+        importlib.import_module(name)
+    return os.getpid()
@@ -1,96 +1,180 @@
 import os
-import cv2
-import numpy as np
-from skimage import measure, morphology
+import threading
+
+from src.lazy_imports import lazy_import
+
+# Heavy dependencies are imported on first use (skimage only by preprocessing tasks)
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+measure = lazy_import("skimage.measure")
+morphology = lazy_import("skimage.morphology")
+
+# Circle canvas storage: "color" = 3-channel BGR PNG (legacy), "gray" = 8-bit
+# single-channel PNG, "bilevel" = 1-bit PNG. The canvas only holds 0 and 255,
+# so all three decode to the same pixels; detection, tracking and video read any.
+# gray is the smallest and quickest to write, bilevel the quickest to decode.
+CANVAS_MODES = ("color", "gray", "bilevel")
+
+# -------------------------------
+# Reusable per-worker processing context
+# -------------------------------
+class ProcessingContext:
+    """
+    CLAHE instance, kernels and output buffers for one zone image shape.
+    All zones of a run share a shape, so a worker builds this once and every
+    frame writes into the same arrays instead of allocating new ones.
+    Not thread-safe: use get_processing_context() to get one per worker.
+    """
+
+    def __init__(self, shape):
+        h, w = shape[:2]
+        self.shape = tuple(shape)
+
+        self.clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8,8))
+        self.morph_kernel = np.ones((1, 1), np.uint8)
+        self.sharpening_kernel = np.array([[-1, -1, -1],
+                                           [-1,  9, -1],
+                                           [-1, -1, -1]])
+
+        # carbon_black_medium buffers
+        self.gray = np.empty((h, w), np.uint8)
+        self.gray_blur = np.empty((h, w), np.uint8)
+        self.contrast = np.empty((h, w), np.uint8)
+        self.carbon = np.empty((h, w), np.uint8)
+        self.opened = np.empty((h, w), np.uint8)
+        self.closed = np.empty((h, w), np.uint8)
+
+        # draw_circles_canvas buffers
+        self.blurred = np.empty((h, w), np.uint8)
+        self.sharpened = np.empty((h, w), np.uint8)
+        self.white_background = np.empty((h, w), np.uint8)
+        self.binary_image = np.empty((h, w), np.uint8)
+        self.filled_image = np.empty((h, w), np.uint8)
+        self.filtered_image = np.empty((h, w), np.uint8)
+        self.mask = np.empty((h, w), bool)
+        self.scratch_mask = np.empty((h, w), bool)
+        self.binary_image_bool = np.empty((h, w), bool)
+        self.filled_image_bool = np.empty((h, w), bool)
+        self.white_canvas = np.empty((h, w, 3), np.uint8)
+        self.gray_canvas = np.empty((h, w), np.uint8)
+
+
+_local = threading.local()
+
+def get_processing_context(shape):
+    """Return the calling worker's context for this image shape, creating it on first use."""
+    contexts = getattr(_local, "contexts", None)
+    if contexts is None:
+        contexts = _local.contexts = {}
+
+    shape = tuple(shape)
+    ctx = contexts.get(shape)
+    if ctx is None:
+        ctx = contexts[shape] = ProcessingContext(shape)
+    return ctx
 
 # -------------------------------
 # Helper: Remove small objects
 # -------------------------------
-def remove_small_objects(binary_image, min_size):
+def remove_small_objects(binary_image, min_size, out=None):
     labels = measure.label(binary_image, connectivity=2)
-    output_image = np.zeros_like(binary_image)
-    for region in measure.regionprops(labels):
-        if region.area >= min_size:
-            for coordinates in region.coords:
-                output_image[coordinates[0], coordinates[1]] = 255
-    return output_image
+    # region areas via one bincount instead of building regionprops per blob
+    areas = np.bincount(labels.ravel())
+    keep = np.where(areas >= min_size, 255, 0).astype(binary_image.dtype)
+    keep[0] = 0  # background label
+    if out is None:
+        out = np.empty_like(binary_image)
+    return np.take(keep, labels, out=out)
 
 # -------------------------------
 # Carbon Black medium filter
 # -------------------------------
-def carbon_black_medium(img):
-    """Carbon Black filter with medium noise cancellation."""
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    gray_blur = cv2.bilateralFilter(gray, d=7, sigmaColor=60, sigmaSpace=60)
-    clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(8,8))
-    contrast = clahe.apply(gray_blur)
-
-    carbon = cv2.adaptiveThreshold(
-        contrast,
+def carbon_black_medium(img, ctx=None):
+    """
+    Carbon Black filter with medium noise cancellation.
+    The result lives in ctx.closed and is overwritten by the next call.
+    """
+    if ctx is None:
+        ctx = get_processing_context(img.shape)
+
+    cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=ctx.gray)
+    cv2.bilateralFilter(ctx.gray, d=7, sigmaColor=60, sigmaSpace=60, dst=ctx.gray_blur)
+    ctx.clahe.apply(ctx.gray_blur, ctx.contrast)
+
+    cv2.adaptiveThreshold(
+        ctx.contrast,
         255,
         cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
         cv2.THRESH_BINARY,
         15,
-        12
+        12,
+        dst=ctx.carbon
     )
 
-    kernel = np.ones((1, 1), np.uint8)
-    opened = cv2.morphologyEx(carbon, cv2.MORPH_OPEN, kernel)
-    closed = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, kernel)
-    return closed  # single-channel binary (0/255)
+    cv2.morphologyEx(ctx.carbon, cv2.MORPH_OPEN, ctx.morph_kernel, dst=ctx.opened)
+    cv2.morphologyEx(ctx.opened, cv2.MORPH_CLOSE, ctx.morph_kernel, dst=ctx.closed)
+    return ctx.closed  # single-channel binary (0/255)
 
 # -------------------------------
-# Process one image (merged pipeline)
+# Circles canvas for one in-memory frame
 # -------------------------------
-def process_image(image_path, circles_output_path):
-    image = cv2.imread(image_path)
-    if image is None:
-        raise FileNotFoundError(f"Could not read image: {image_path}")
+def draw_circles_canvas(image, ctx=None, canvas_mode="color"):
+    """
+    Run the merged preprocessing pipeline on a BGR zone image and return
+    the white canvas with one filled black circle per detected blob.
+    The canvas is ctx.white_canvas (BGR, canvas_mode "color") or
+    ctx.gray_canvas (single-channel, "gray"/"bilevel"); copy it if it must
+    outlive the next call.
+    """
+    if canvas_mode not in CANVAS_MODES:
+        raise ValueError(f"Unknown canvas mode '{canvas_mode}'. Expected one of {CANVAS_MODES}")
+    if ctx is None:
+        ctx = get_processing_context(image.shape)
 
     # ---- Step 1: Carbon Black ----
-    cb_img = carbon_black_medium(image)  # 0/255 single-channel
+    cb_img = carbon_black_medium(image, ctx)  # 0/255 single-channel
 
     # ---- Step 2: Further smoothing/sharpening & produce a "white_background" ----
-    blurred = cv2.GaussianBlur(cb_img, (5, 5), 0)
+    cv2.GaussianBlur(cb_img, (5, 5), 0, dst=ctx.blurred)
 
-    sharpening_kernel = np.array([[-1, -1, -1],
-                                  [-1,  9, -1],
-                                  [-1, -1, -1]])
-    sharpened = cv2.filter2D(blurred, -1, sharpening_kernel)
+    sharpened = cv2.filter2D(ctx.blurred, -1, ctx.sharpening_kernel, dst=ctx.sharpened)
 
     # Remove gray pixels in range 85–180
-    mask = (sharpened >= 85) & (sharpened <= 180)
-    sharpened[mask] = 0
+    np.greater_equal(sharpened, 85, out=ctx.mask)
+    np.less_equal(sharpened, 180, out=ctx.scratch_mask)
+    np.logical_and(ctx.mask, ctx.scratch_mask, out=ctx.mask)
+    np.copyto(sharpened, 0, where=ctx.mask)
 
     # White background for pixels < 85
-    white_background = np.ones_like(sharpened) * 255
-    low_gray_mask = sharpened < 85
-    white_background[low_gray_mask] = sharpened[low_gray_mask]
+    white_background = ctx.white_background
+    white_background.fill(255)
+    low_gray_mask = np.less(sharpened, 85, out=ctx.scratch_mask)
+    np.copyto(white_background, sharpened, where=low_gray_mask)
 
     # Save intermediate result
     #cv2.imwrite(output_path, white_background)
 
     # ---- Binary & cleaning to obtain foreground blobs ----
-    _, binary_image = cv2.threshold(white_background, 1, 255, cv2.THRESH_BINARY_INV)
-    binary_image_bool = binary_image.astype(bool)
+    cv2.threshold(white_background, 1, 255, cv2.THRESH_BINARY_INV, dst=ctx.binary_image)
+    binary_image_bool = np.not_equal(ctx.binary_image, 0, out=ctx.binary_image_bool)
 
     # Fill small holes
-    filled_image_bool = morphology.remove_small_holes(binary_image_bool, area_threshold=200)
-    filled_image = filled_image_bool.astype(np.uint8) * 255  # white objects on black bg
+    filled_image_bool = morphology.remove_small_holes(
+        binary_image_bool, area_threshold=200, out=ctx.filled_image_bool
+    )
+    filled_image = np.multiply(filled_image_bool, np.uint8(255), out=ctx.filled_image)  # white objects on black bg
 
     # Remove small objects (keeps only sufficiently large blobs)
-    filtered_image_preinv = remove_small_objects(filled_image, min_size=45)  # white objects on black bg
+    filtered_image_preinv = remove_small_objects(filled_image, min_size=45, out=ctx.filtered_image)  # white objects on black bg
 
     # ---- NEW STEP: contour -> draw equivalent circles on white canvas ----
-    # Robust findContours for different OpenCV versions
-    contours_data = cv2.findContours(filtered_image_preinv.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # findContours leaves its input untouched since OpenCV 3.2, so no copy is needed
+    contours_data = cv2.findContours(filtered_image_preinv, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     contours = contours_data[0] if len(contours_data) == 2 else contours_data[1]
 
-    # Make a white RGB canvas (same size as original image)
-    white_canvas = np.ones_like(image, dtype=np.uint8) * 255
-    # If original was grayscale (unlikely with cv2.imread default), ensure 3-channels
-    if white_canvas.ndim == 2:
-        white_canvas = cv2.cvtColor(white_canvas, cv2.COLOR_GRAY2BGR)
+    # White canvas (same size as the zone image)
+    white_canvas = ctx.white_canvas if canvas_mode == "color" else ctx.gray_canvas
+    white_canvas.fill(255)
 
     for contour in contours:
         area = cv2.contourArea(contour)
@@ -111,13 +195,30 @@ def process_image(image_path, circles_output_path):
         # draw filled black circle on white canvas
         cv2.circle(white_canvas, (cx, cy), max(radius, 1), (0, 0, 0), -1)
 
-    # Save circles output
-    cv2.imwrite(circles_output_path, white_canvas)
-
     # ---- Final step: invert pre-inv filtered image to match previous behavior and save ----
     #filtered_image = cv2.bitwise_not(filtered_image_preinv)
     #cv2.imwrite(filtered_output_path, filtered_image)
 
+    return white_canvas
+
+# -------------------------------
+# Process one image (merged pipeline)
+# -------------------------------
+def canvas_write_params(canvas_mode):
+    """cv2.imwrite flags for a canvas mode (bilevel packs 8 pixels per byte)."""
+    return [cv2.IMWRITE_PNG_BILEVEL, 1] if canvas_mode == "bilevel" else []
+
+
+def process_image(image_path, circles_output_path, ctx=None, canvas_mode="color"):
+    image = cv2.imread(image_path)
+    if image is None:
+        raise FileNotFoundError(f"Could not read image: {image_path}")
+
+    white_canvas = draw_circles_canvas(image, ctx, canvas_mode)
+
+    # Save circles output
+    cv2.imwrite(circles_output_path, white_canvas, canvas_write_params(canvas_mode))
+
 # -------------------------------
 # Loop over dataset and call process_image
 # -------------------------------
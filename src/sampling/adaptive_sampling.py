@@ -0,0 +1,116 @@
+import math
+from collections import namedtuple
+
+from src.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Two-sided normal quantiles for the supported confidence levels
+Z_SCORES = {0.90: 1.645, 0.95: 1.96, 0.99: 2.576}
+
+# half_widths: CI half-width per size class, in the metric's own unit
+# n_sampled: units that entered the mean; n_excluded: visited units that did not
+# (unreadable / not eligible); n_total: every unit in the population
+SamplingReport = namedtuple("SamplingReport", ["half_widths", "n_sampled", "n_excluded", "n_total", "confidence"])
+
+
+# -------------------------------
+# Sampling order
+# -------------------------------
+def stratified_order(n_items, n_strata=None, seed=None):
+    """
+    Randomised stratified visiting order for indices 0..n_items-1.
+    The sequence is cut into contiguous strata and every round draws one
+    unvisited index from each stratum (strata in random order), so any
+    prefix of the order covers the whole recording evenly in time.
+    """
+    if n_items <= 0:
+        return []
+
+    rng = np.random.default_rng(seed)
+    n_strata = n_strata or max(1, int(math.sqrt(n_items)))
+    strata = [list(rng.permutation(chunk)) for chunk in np.array_split(np.arange(n_items), n_strata)]
+
+    order = []
+    while len(order) < n_items:
+        for k in rng.permutation(len(strata)):
+            if strata[k]:
+                order.append(int(strata[k].pop()))
+    return order
+
+
+# -------------------------------
+# Running mean + confidence interval
+# -------------------------------
+class RunningEstimate:
+    """
+    Welford running mean/variance of one value per size class, sampled
+    without replacement from a finite population of frames (or frame pairs).
+    Units can turn out to be ineligible when visited (exclude()); the
+    eligible part of the unvisited population is then estimated from the
+    eligible share seen so far, for the finite population correction.
+    """
+
+    def __init__(self, n_metrics, population_size, confidence=0.95):
+        if confidence not in Z_SCORES:
+            raise ValueError(f"Unsupported confidence {confidence}. Expected one of {sorted(Z_SCORES)}")
+        self.population_size = population_size
+        self.confidence = confidence
+        self.z = Z_SCORES[confidence]
+        self.n = 0
+        self.n_excluded = 0
+        self.mean = np.zeros(n_metrics)
+        self._m2 = np.zeros(n_metrics)
+
+    def add(self, values):
+        self.n += 1
+        delta = np.asarray(values, dtype=float) - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (np.asarray(values, dtype=float) - self.mean)
+
+    def exclude(self):
+        """Record one visited unit that does not enter the mean (e.g. an unreadable frame)."""
+        self.n_excluded += 1
+
+    @property
+    def n_visited(self):
+        return self.n + self.n_excluded
+
+    def eligible_population(self):
+        """Eligible units in the population: exact once all are visited, else estimated."""
+        if self.n_visited >= self.population_size:
+            return self.n
+        return self.population_size * self.n / self.n_visited
+
+    def half_widths(self):
+        if self.n_visited >= self.population_size:
+            return np.zeros_like(self.mean)  # every unit seen: the mean is exact
+        if self.n < 2:
+            return np.full_like(self.mean, np.inf)
+
+        std = np.sqrt(self._m2 / (self.n - 1))
+        # finite population correction, since frames are drawn without replacement
+        eligible = self.eligible_population()
+        fpc = math.sqrt(max(0.0, eligible - self.n) / (eligible - 1))
+        return self.z * std / math.sqrt(self.n) * fpc
+
+    def converged(self, target_precision, abs_tolerance, min_samples):
+        """
+        True once every CI half-width is within target_precision x |mean|,
+        or within abs_tolerance for classes whose mean is close to zero.
+        """
+        if self.n_visited >= self.population_size:
+            return True
+        if self.n < min_samples:
+            return False
+        allowed = np.maximum(target_precision * np.abs(self.mean), abs_tolerance)
+        return bool(np.all(self.half_widths() <= allowed))
+
+    def report(self):
+        return SamplingReport(
+            tuple(float(h) for h in self.half_widths()),
+            self.n,
+            self.n_excluded,
+            max(self.population_size, 0),
+            self.confidence,
+        )
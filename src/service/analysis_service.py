@@ -0,0 +1,513 @@
+"""
+Long-running local analysis service (detection + tracking on preprocessed runs).
+
+Keeps one warm ExecutionBackend alive and accepts jobs over localhost HTTP, so
+re-analysing a run with other calibration values no longer means starting a
+fresh `python run_pipeline.py` with edited settings.
+
+    python -m src.service.analysis_service serve --port 8765
+    python -m src.service.analysis_service submit <run_folder> --fps 100 --px-per-mm 4.58
+
+Endpoints (JSON):
+    POST /jobs                 {"run_folder": ..., "fps": ..., "px_per_mm": ...,
+                                "zones": [...], "run_name": ..., "target_precision": ...}
+                               -> 202 {"job_id": ...}   (zones/run_name/target_precision optional)
+    GET  /jobs/<id>            -> status, progress and per-zone metrics
+    GET  /jobs/<id>/events     -> progress stream, one JSON object per line
+    GET  /health               -> backend settings and queue length
+
+Finished jobs stay queryable for job_ttl seconds (at most max_finished_jobs
+of them); after that /jobs/<id> answers 404.
+
+Jobs that arrive within batch_window seconds of each other are submitted to
+the pools together, and zones shared by jobs of one batch are only computed
+once (counts are shared across calibrations, velocities per fps/px_per_mm).
+Results are written through db_utils exactly like the batch pipeline.
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import itertools
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from src.database.db_utils import create_tables, insert_run
+from src.ingestion.frame_manifest import FrameManifest
+from src.pipeline.executors import ExecutionBackend, EXECUTION_MODES
+from src.pipeline.run_pipeline import submit_zone, store_zone_results
+from src.pipeline.worker import warm_up
+
+
+# ---------- Jobs ----------
+def parse_job_spec(payload):
+    """
+    Validate a POST /jobs body. Raises ValueError with a readable message.
+    Zone names are checked against the run folder by AnalysisService.submit.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Job must be a JSON object")
+
+    run_folder = payload.get("run_folder")
+    if not isinstance(run_folder, str) or not os.path.isdir(run_folder):
+        raise ValueError(f"run_folder is not a folder: {run_folder!r}")
+    run_folder = os.path.abspath(run_folder)
+
+    spec = {"run_folder": run_folder}
+    for key in ("fps", "px_per_mm"):
+        value = payload.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise ValueError(f"{key} must be a positive number, got {value!r}")
+        spec[key] = float(value)
+
+    target_precision = payload.get("target_precision")
+    if target_precision is not None and (
+        isinstance(target_precision, bool) or not isinstance(target_precision, (int, float)) or target_precision <= 0
+    ):
+        raise ValueError(f"target_precision must be a positive number or null, got {target_precision!r}")
+    spec["target_precision"] = target_precision
+
+    zones = payload.get("zones")
+    if zones is not None and (not isinstance(zones, list) or not all(isinstance(z, str) and z for z in zones)):
+        raise ValueError(f"zones must be a list of zone folder names or null, got {zones!r}")
+    spec["zones"] = zones
+
+    run_name = payload.get("run_name")
+    if run_name is not None and not isinstance(run_name, str):
+        raise ValueError(f"run_name must be a string or null, got {run_name!r}")
+    spec["run_name"] = run_name or os.path.basename(run_folder.rstrip(os.sep))
+    return spec
+
+
+class Job:
+    """One analysis request; progress events are kept so late listeners can replay them."""
+
+    def __init__(self, job_id, spec):
+        self.job_id = job_id
+        self.spec = spec
+        self.status = "queued"
+        self.results = {}
+        self.error = None
+        self.events = []
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._cond = threading.Condition(threading.RLock())
+        self.emit({"event": "queued"})
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+    def emit(self, event):
+        with self._cond:  # re-entrant: finish() calls this while holding it
+            event = dict(event, job_id=self.job_id, time=time.time())
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, status, event):
+        """Set the final status and emit the last event atomically, so streams never miss it."""
+        with self._cond:
+            self.status = status
+            self.finished_at = time.time()
+            self.emit(dict(event, event="finished", status=status))
+
+    def wait_events(self, start, timeout=None):
+        """Block until there are events after index start (or the job is finished)."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > start or self.finished, timeout)
+            return self.events[start:], self.finished
+
+    def summary(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "run_name": self.spec["run_name"],
+            "run_folder": self.spec["run_folder"],
+            "fps": self.spec["fps"],
+            "px_per_mm": self.spec["px_per_mm"],
+            "target_precision": self.spec["target_precision"],
+            "zones_done": len(self.results),
+            "zones_total": len(self.spec["zones"]),
+            "results": dict(self.results),
+            "error": self.error,
+        }
+
+
+# ---------- Service ----------
+class AnalysisService:
+    """
+    Job queue in front of a warm ExecutionBackend.
+
+    A dispatcher thread groups jobs into batches, submits every zone of a
+    batch at once (so small jobs share the pools instead of queuing behind
+    each other) and hands the batch to a collector thread that stores results
+    and streams progress while the next batch is being gathered.
+    """
+
+    def __init__(self, execution_mode="hybrid", max_workers=None, batch_window=0.05,
+                 max_batch_jobs=16, chunk_size=250, job_ttl=3600.0, max_finished_jobs=500):
+        self.batch_window = batch_window
+        self.max_batch_jobs = max_batch_jobs
+        self.chunk_size = chunk_size
+        # finished jobs stay queryable for job_ttl seconds, at most max_finished_jobs of them
+        self.job_ttl = job_ttl
+        self.max_finished_jobs = max_finished_jobs
+
+        self.backend = ExecutionBackend(execution_mode, max_workers)
+        self.jobs = {}
+        self._manifests = {}  # run folder -> FrameManifest, refreshed incrementally per job
+        self._manifest_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._ids = itertools.count(1)
+        self._batches = itertools.count(1)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="dispatcher", daemon=True)
+
+    def start(self):
+        create_tables()
+        self.warm_workers()
+        self._dispatcher.start()
+
+    def warm_workers(self):
+        """Start every pool process and import cv2/numpy before the first job arrives."""
+        pids = {warm_up()}  # thread workers share this process
+        if self.backend.n_procs:
+            executor = self.backend.python_executor
+            pids.update(f.result() for f in [executor.submit(warm_up) for _ in range(self.backend.n_procs)])
+        print(f"[INFO] Warmed up {len(pids)} process(es)")
+
+    def shutdown(self):
+        self._stopping.set()
+        self._queue.put(None)
+        self._dispatcher.join()
+        self.backend.shutdown()
+
+    # -------------------------------
+    # Job intake
+    # -------------------------------
+    def run_manifest(self, run_folder):
+        """In-memory manifest of a run folder; later jobs only rescan folders that changed."""
+        with self._manifest_lock:
+            manifest = self._manifests.get(run_folder)
+            if manifest is None:
+                manifest = self._manifests[run_folder] = FrameManifest(run_folder)
+            manifest.refresh()
+            return manifest
+
+    def submit(self, payload):
+        spec = parse_job_spec(payload)
+
+        manifest = self.run_manifest(spec["run_folder"])
+        available = manifest.subdirs()
+        if not available:
+            raise ValueError(f"No zone folders in {spec['run_folder']}")
+        spec["zones"] = spec["zones"] or available
+        missing = [z for z in spec["zones"] if z not in available]
+        if missing:
+            raise ValueError(f"Zones not found in {spec['run_folder']}: {missing}")
+
+        # zone file lists from the manifest: workers do not list the folders again
+        spec["zone_files"] = {
+            z: (manifest.files(z, (".png",)), manifest.files(z, (".png", ".jpg", ".jpeg"), order="numeric"))
+            for z in spec["zones"]
+        }
+
+        with self._lock:
+            self._evict_finished_jobs()
+            job = Job(str(next(self._ids)), spec)
+            self.jobs[job.job_id] = job
+        self._queue.put(job)
+        print(f"[INFO] Job {job.job_id} queued: {spec['run_name']} ({len(spec['zones'])} zones)")
+        return job
+
+    def _evict_finished_jobs(self):
+        """Forget finished jobs past job_ttl, then the oldest beyond max_finished_jobs (caller holds _lock)."""
+        now = time.time()
+        # oldest first, so the expired jobs form a prefix
+        finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished_at)
+        n_keep = min(sum(now - j.finished_at <= self.job_ttl for j in finished), self.max_finished_jobs)
+        for job in finished[:len(finished) - n_keep]:
+            del self.jobs[job.job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    # -------------------------------
+    # Batching
+    # -------------------------------
+    def _next_batch(self):
+        """Wait for one job, then gather whatever else arrives within batch_window."""
+        job = self._queue.get()
+        if job is None:
+            return []
+
+        batch = [job]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_jobs:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)  # keep the stop signal for the loop
+                break
+            batch.append(job)
+        return batch
+
+    def _dispatch_loop(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            batch_id = next(self._batches)
+            submitted = self._submit_batch(batch_id, batch)
+            threading.Thread(
+                target=self._collect_batch, args=(batch_id, submitted),
+                name=f"collector-{batch_id}", daemon=True
+            ).start()
+
+    def _submit_batch(self, batch_id, batch):
+        """Queue every zone of the batch; identical work is submitted only once."""
+        detections, zones = {}, {}
+        submitted = []
+        for job in batch:
+            spec = job.spec
+            job.status = "running"
+            job.emit({"event": "started", "batch": batch_id, "batch_jobs": len(batch)})
+
+            pending = []
+            try:
+                for zone_name in spec["zones"]:
+                    zone_path = os.path.join(spec["run_folder"], zone_name)
+                    zone_key = (zone_path, spec["fps"], spec["px_per_mm"], spec["target_precision"])
+                    if zone_key not in zones:
+                        detection = detections.get((zone_path, spec["target_precision"]))
+                        image_files, frame_files = spec["zone_files"][zone_name]
+                        zones[zone_key] = submit_zone(
+                            zone_path, spec["fps"], spec["px_per_mm"], self.backend,
+                            spec["target_precision"], self.chunk_size, image_files, frame_files,
+                            detection=detection
+                        )
+                        detections[(zone_path, spec["target_precision"])] = zones[zone_key].detection
+                    pending.append((zone_name, zones[zone_key]))
+            except Exception as e:
+                self._fail(job, e)
+                continue
+            submitted.append((job, pending))
+
+        print(f"[INFO] Batch {batch_id}: {len(batch)} job(s), {len(zones)} zone task(s) submitted")
+        return submitted
+
+    def _collect_batch(self, batch_id, submitted):
+        for job, pending in submitted:
+            spec = job.spec
+            try:
+                run_id = insert_run(spec["run_name"])
+                for zone_name, pending_zone in pending:
+                    metrics = store_zone_results(run_id, spec["run_name"], zone_name, pending_zone)
+                    job.results[zone_name] = metrics
+                    job.emit({
+                        "event": "zone",
+                        "zone": zone_name,
+                        "done": len(job.results),
+                        "total": len(spec["zones"]),
+                        "metrics": metrics,
+                    })
+            except Exception as e:
+                self._fail(job, e)
+                continue
+
+            job.finish("done", {"elapsed_s": round(time.time() - job.submitted_at, 3)})
+            print(f"✅ Job {job.job_id} done ({spec['run_name']}, batch {batch_id})")
+
+    @staticmethod
+    def _fail(job, exc):
+        job.error = f"{type(exc).__name__}: {exc}"
+        job.finish("failed", {"error": job.error})
+        print(f"[ERROR] Job {job.job_id} failed: {job.error}")
+
+
+# ---------- HTTP front end ----------
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP; the event stream is newline-delimited JSON until the job finishes."""
+
+    service = None  # set by make_server
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(payload)
+        except ValueError as e:  # invalid JSON or job spec
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            print(f"[ERROR] Could not queue job: {type(e).__name__}: {e}")
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        self._send_json(202, {"job_id": job.job_id, "status": job.status})
+
+    def do_GET(self):
+        parts = [p for p in self.path.split("/") if p]
+
+        if parts == ["health"]:
+            backend = self.service.backend
+            self._send_json(200, {
+                "status": "ok",
+                "execution_mode": backend.mode,
+                "threads_per_worker": backend.threads_per_worker,
+                "queued_jobs": self.service._queue.qsize(),
+            })
+            return
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                self._send_json(404, {"error": f"Unknown job {parts[1]}"})
+            elif len(parts) == 2:
+                self._send_json(200, job.summary())
+            elif parts[2] == "events":
+                self._stream_events(job)
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def _stream_events(self, job):
+        # HTTP/1.0 response without Content-Length: the stream ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        sent = 0
+        while True:
+            events, finished = job.wait_events(sent, timeout=30)
+            for event in events:
+                self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            sent += len(events)
+            if finished and sent == len(job.events):
+                break
+
+    def log_message(self, format, *args):
+        pass  # job progress is printed by the service itself
+
+
+def make_server(service, host="127.0.0.1", port=8765):
+    handler = type("BoundRequestHandler", (ServiceRequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve(host="127.0.0.1", port=8765, execution_mode="hybrid", max_workers=None,
+          batch_window=0.05, max_batch_jobs=16, chunk_size=250, job_ttl=3600.0, max_finished_jobs=500):
+    service = AnalysisService(execution_mode, max_workers, batch_window, max_batch_jobs, chunk_size,
+                              job_ttl, max_finished_jobs)
+    service.start()
+    server = make_server(service, host, port)
+    print(f"[INFO] Analysis service listening on http://{host}:{port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[INFO] Analysis service stopped by user.")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+# ---------- Client ----------
+def submit_job(url, run_folder, fps, px_per_mm, zones=None, run_name=None, target_precision=None):
+    """POST a job to a running service and return its job id."""
+    payload = {"run_folder": os.path.abspath(run_folder), "fps": fps, "px_per_mm": px_per_mm,
+               "zones": zones, "run_name": run_name, "target_precision": target_precision}
+    request = urllib.request.Request(
+        f"{url}/jobs", data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())["job_id"]
+    except urllib.error.HTTPError as e:
+        raise ValueError(f"[ERROR] Job rejected: {json.loads(e.read()).get('error')}") from e
+
+
+def stream_job_events(url, job_id):
+    """Yield the progress events of a job until it finishes."""
+    with urllib.request.urlopen(f"{url}/jobs/{job_id}/events") as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+
+# ---------- Main ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local bubble analysis service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="start the service")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--mode", choices=EXECUTION_MODES, default="hybrid")
+    serve_parser.add_argument("--max-workers", type=int, default=None)
+    serve_parser.add_argument("--batch-window", type=float, default=0.05,
+                              help="seconds to wait for more jobs before submitting a batch")
+    serve_parser.add_argument("--max-batch-jobs", type=int, default=16)
+    serve_parser.add_argument("--chunk-size", type=int, default=250, help="frames per tracking task")
+    serve_parser.add_argument("--job-ttl", type=float, default=3600,
+                              help="seconds a finished job stays queryable")
+    serve_parser.add_argument("--max-finished-jobs", type=int, default=500)
+
+    submit_parser = commands.add_parser("submit", help="send one run to a running service")
+    submit_parser.add_argument("run_folder", help="preprocessed run folder (one subfolder per zone)")
+    submit_parser.add_argument("--url", default="http://127.0.0.1:8765")
+    submit_parser.add_argument("--fps", type=float, default=100)
+    submit_parser.add_argument("--px-per-mm", type=float, default=4.58)
+    submit_parser.add_argument("--zones", nargs="*", default=None)
+    submit_parser.add_argument("--run-name", default=None)
+    submit_parser.add_argument("--target-precision", type=float, default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.mode, args.max_workers,
+              args.batch_window, args.max_batch_jobs, args.chunk_size,
+              args.job_ttl, args.max_finished_jobs)
+    else:
+        job_id = submit_job(args.url, args.run_folder, args.fps, args.px_per_mm,
+                            args.zones, args.run_name, args.target_precision)
+        print(f"[INFO] Submitted job {job_id}")
+        for event in stream_job_events(args.url, job_id):
+            if event["event"] == "zone":
+                m = event["metrics"]
+                print(f"[INFO] {event['done']}/{event['total']} {event['zone']}: "
+                      f"n={m['avg_small_count']:.1f}/{m['avg_medium_count']:.1f}/{m['avg_large_count']:.1f} "
+                      f"v={m['avg_small_velocity']:.3f}/{m['avg_medium_velocity']:.3f}/{m['avg_large_velocity']:.3f}")
+            elif event["event"] == "finished":
+                if event["status"] == "done":
+                    print(f"✅ Job {job_id} done in {event['elapsed_s']} s")
+                else:
+                    print(f"[ERROR] Job {job_id} failed: {event['error']}")
@@ -1,7 +1,16 @@
-import cv2
-import numpy as np
 import os
 
+from src.lazy_imports import lazy_import
+from src.sampling.adaptive_sampling import RunningEstimate, stratified_order
+
+# Heavy dependencies are imported on first use
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+def read_frame(path):
+    """Read a canvas in its stored format: single-channel canvases stay 2-D (no BGR expansion)."""
+    return cv2.imread(path, cv2.IMREAD_ANYCOLOR)
+
 def preprocess_frame(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if len(frame.shape) == 3 else frame
     blurred = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -78,57 +87,185 @@ def calculate_velocity(matched_pairs, fps, px_per_mm):
 def average_velocity(velocities):
     return sum(velocities) / len(velocities) if velocities else 0
 
-def calculate_avg_velocities_from_folder(folder_path, fps, px_per_mm):
+def detect_frame_centroids(frame):
     """
-    Returns: avg_small_vel, avg_med_vel, avg_large_vel
+    Detect and classify circles in one frame.
+    Returns: (small, medium, large) centroid lists
+    """
+    preprocessed = preprocess_frame(frame)
+    circles = detect_filled_black_circles(preprocessed)
+    small, medium, large = classify_bubbles(circles)
+    return calculate_centroids(small), calculate_centroids(medium), calculate_centroids(large)
+
+def frame_pair_velocities(prev_centroids, curr_centroids, fps, px_per_mm):
+    """
+    Average velocity per size class between two consecutive frames.
+    Both arguments are (small, medium, large) centroid lists.
+    Returns: small_vel, medium_vel, large_vel
     """
+    return tuple(
+        average_velocity(calculate_velocity(match_bubbles(curr, prev), fps, px_per_mm))
+        for prev, curr in zip(prev_centroids, curr_centroids)
+    )
+
+def list_frame_files(folder_path):
+    """Frame file names of a zone folder in numeric (digit-extraction) order."""
     if not os.path.isdir(folder_path):
         raise FileNotFoundError(f"[ERROR] Folder not found: {folder_path}")
     
-    frame_files = sorted(
+    return sorted(
         [f for f in os.listdir(folder_path) if f.lower().endswith((".png", ".jpg", ".jpeg"))],
         key=lambda x: int(''.join(filter(str.isdigit, x)) or -1)  # numeric sort
     )
+
+def calculate_avg_velocities_from_folder(folder_path, fps, px_per_mm, frame_files=None):
+    """
+    frame_files: names in numeric order (e.g. FrameManifest.files(order="numeric"));
+    listed from folder_path when None.
+    Returns: avg_small_vel, avg_med_vel, avg_large_vel
+    """
+    if frame_files is None:
+        frame_files = list_frame_files(folder_path)
     
-    prev_small, prev_medium, prev_large = [], [], []
+    prev_centroids = ([], [], [])
     
     total_small_vel, total_medium_vel, total_large_vel = 0, 0, 0
     frame_count = 0
 
     for fname in frame_files:
-        frame = cv2.imread(os.path.join(folder_path, fname))
+        frame = read_frame(os.path.join(folder_path, fname))
         if frame is None:
             continue
         
-        preprocessed = preprocess_frame(frame)
-        circles = detect_filled_black_circles(preprocessed)
-        small, medium, large = classify_bubbles(circles)
-
-        cent_small = calculate_centroids(small)
-        cent_medium = calculate_centroids(medium)
-        cent_large = calculate_centroids(large)
+        centroids = detect_frame_centroids(frame)
         
-        if prev_small:
-            small_matches = match_bubbles(cent_small, prev_small)
-            medium_matches = match_bubbles(cent_medium, prev_medium)
-            large_matches = match_bubbles(cent_large, prev_large)
-
-            small_vels = calculate_velocity(small_matches, fps, px_per_mm)
-            medium_vels = calculate_velocity(medium_matches, fps, px_per_mm)
-            large_vels = calculate_velocity(large_matches, fps, px_per_mm)
+        # previous frame must have small bubbles for the pair to count
+        if prev_centroids[0]:
+            small_vel, medium_vel, large_vel = frame_pair_velocities(
+                prev_centroids, centroids, fps, px_per_mm
+            )
             
-            total_small_vel += average_velocity(small_vels)
-            total_medium_vel += average_velocity(medium_vels)
-            total_large_vel += average_velocity(large_vels)
+            total_small_vel += small_vel
+            total_medium_vel += medium_vel
+            total_large_vel += large_vel
             frame_count += 1
         
-        prev_small, prev_medium, prev_large = cent_small, cent_medium, cent_large
+        prev_centroids = centroids
 
     avg_small = total_small_vel / frame_count if frame_count else 0
     avg_medium = total_medium_vel / frame_count if frame_count else 0
     avg_large = total_large_vel / frame_count if frame_count else 0
 
     return avg_small, avg_medium, avg_large
+
+def split_frame_chunks(frame_files, chunk_size):
+    """Cut the ordered frame list into consecutive chunks of at most chunk_size frames."""
+    chunk_size = max(1, chunk_size)
+    return [frame_files[i:i + chunk_size] for i in range(0, len(frame_files), chunk_size)]
+
+def track_frame_chunk(folder_path, frame_files, fps, px_per_mm):
+    """
+    Detect and match bubbles inside one chunk of consecutive frames.
+    Pairs are formed exactly as in calculate_avg_velocities_from_folder,
+    except the pair that crosses into the next chunk, which
+    merge_chunk_velocities builds from the returned boundary centroids.
+    Returns: (first_centroids, pair_velocities, last_centroids)
+      first/last_centroids: centroids of the first/last readable frame (None if none)
+      pair_velocities: (small, medium, large) velocity of every counted pair, in order
+    """
+    first_centroids = None
+    prev_centroids = None
+    pair_velocities = []
+
+    for fname in frame_files:
+        frame = read_frame(os.path.join(folder_path, fname))
+        if frame is None:
+            continue
+        
+        centroids = detect_frame_centroids(frame)
+        if prev_centroids is None:
+            first_centroids = centroids
+        elif prev_centroids[0]:
+            pair_velocities.append(frame_pair_velocities(prev_centroids, centroids, fps, px_per_mm))
+        
+        prev_centroids = centroids
+
+    return first_centroids, pair_velocities, prev_centroids
+
+def merge_chunk_velocities(chunk_results, fps, px_per_mm):
+    """
+    Combine track_frame_chunk results (in frame order) into the zone averages.
+    Boundary pairs are matched here and every pair is accumulated in the
+    same order as the serial loop, so the result is bit-for-bit identical.
+    Returns: avg_small_vel, avg_med_vel, avg_large_vel
+    """
+    prev_centroids = ([], [], [])
+    
+    total_small_vel, total_medium_vel, total_large_vel = 0, 0, 0
+    frame_count = 0
+
+    for first_centroids, pair_velocities, last_centroids in chunk_results:
+        if first_centroids is None:
+            continue  # no readable frame in this chunk
+        
+        if prev_centroids[0]:
+            boundary = frame_pair_velocities(prev_centroids, first_centroids, fps, px_per_mm)
+            pair_velocities = [boundary] + pair_velocities
+        
+        for small_vel, medium_vel, large_vel in pair_velocities:
+            total_small_vel += small_vel
+            total_medium_vel += medium_vel
+            total_large_vel += large_vel
+            frame_count += 1
+        
+        prev_centroids = last_centroids
+
+    avg_small = total_small_vel / frame_count if frame_count else 0
+    avg_medium = total_medium_vel / frame_count if frame_count else 0
+    avg_large = total_large_vel / frame_count if frame_count else 0
+
+    return avg_small, avg_medium, avg_large
+
+def estimate_avg_velocities_from_folder(folder_path, fps, px_per_mm, target_precision=0.05,
+                                        confidence=0.95, min_samples=30, abs_tolerance=0.005,
+                                        seed=None, frame_files=None):
+    """
+    Approximate calculate_avg_velocities_from_folder: sample consecutive
+    frame pairs in a randomised stratified order and stop once the confidence
+    interval of every size class is within target_precision (relative) or
+    abs_tolerance (m/s). As in the exact loop, a pair only counts when the
+    first frame has small bubbles; unreadable frames drop their pairs.
+    Centroids are cached per frame, so neighbouring pairs share a decode and
+    no frame is read more than once.
+    Returns: (avg_small_vel, avg_med_vel, avg_large_vel), SamplingReport
+    """
+    if frame_files is None:
+        frame_files = list_frame_files(folder_path)
+    n_pairs = max(0, len(frame_files) - 1)
+    estimate = RunningEstimate(3, n_pairs, confidence)
+
+    centroids_cache = {}  # frame index -> centroids (None if unreadable)
+
+    def frame_centroids(i):
+        if i not in centroids_cache:
+            frame = read_frame(os.path.join(folder_path, frame_files[i]))
+            centroids_cache[i] = detect_frame_centroids(frame) if frame is not None else None
+        return centroids_cache[i]
+
+    for idx in stratified_order(n_pairs, seed=seed):
+        prev_centroids = frame_centroids(idx)
+        # the next frame is only decoded when the pair can count
+        curr_centroids = frame_centroids(idx + 1) if prev_centroids is not None and prev_centroids[0] else None
+        if curr_centroids is None:
+            estimate.exclude()
+        else:
+            estimate.add(frame_pair_velocities(prev_centroids, curr_centroids, fps, px_per_mm))
+
+        if estimate.converged(target_precision, abs_tolerance, min_samples):
+            break
+
+    avg_vels = tuple(float(m) for m in estimate.mean) if estimate.n else (0, 0, 0)
+    return avg_vels, estimate.report()
 # =========================
 # Database Update
 # =========================
@@ -1,8 +1,12 @@
 import os
-import cv2
 
+from src.lazy_imports import lazy_import
 
-def create_video_from_images(image_folder, video_output_path, fps=100.0):
+# Imported on first use
+cv2 = lazy_import("cv2")
+
+
+def create_video_from_images(image_folder, video_output_path, fps=100.0, image_files=None):
     """
     Create a video from images in a folder.
 
@@ -10,12 +14,14 @@ def create_video_from_images(image_folder, video_output_path, fps=100.0):
         image_folder (str): Path to folder containing preprocessed images.
         video_output_path (str): Path to save the video file.
         fps (float): Frames per second for the output video.
+        image_files (list): Optional image names in frame order; skips listing the folder.
     """
     # Collect images in sorted order
-    image_files = [
-        f for f in sorted(os.listdir(image_folder))
-        if f.lower().endswith((".jpg", ".jpeg", ".png"))
-    ]
+    if image_files is None:
+        image_files = [
+            f for f in sorted(os.listdir(image_folder))
+            if f.lower().endswith((".jpg", ".jpeg", ".png"))
+        ]
 
     if not image_files:
         print(f"[WARNING] No images found in {image_folder}")
@@ -23,12 +29,14 @@ def create_video_from_images(image_folder, video_output_path, fps=100.0):
 
     # Read first frame to get dimensions
     first_image_path = os.path.join(image_folder, image_files[0])
-    frame = cv2.imread(first_image_path)
+    # IMREAD_ANYCOLOR keeps single-channel / bilevel canvases 2-D, which decodes faster
+    frame = cv2.imread(first_image_path, cv2.IMREAD_ANYCOLOR)
     if frame is None:
         print(f"[ERROR] Could not read first image: {first_image_path}")
         return
 
-    height, width, _ = frame.shape
+    height, width = frame.shape[:2]
+    bgr_frame = None  # reused buffer for single-channel frames
 
     # Initialize video writer (XVID → .avi format)
     fourcc = cv2.VideoWriter_fourcc(*'XVID')
@@ -37,10 +45,17 @@ def create_video_from_images(image_folder, video_output_path, fps=100.0):
     # Write frames sequentially
     for image_file in image_files:
         image_path = os.path.join(image_folder, image_file)
-        frame = cv2.imread(image_path)
+        frame = cv2.imread(image_path, cv2.IMREAD_ANYCOLOR)
         if frame is None:
             print(f"[WARNING] Skipping unreadable image: {image_file}")
             continue
+        if frame.ndim == 2:
+            # the XVID writer expects BGR frames
+            if bgr_frame is None or bgr_frame.shape[:2] != frame.shape:
+                bgr_frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+            else:
+                cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR, dst=bgr_frame)
+            frame = bgr_frame
         video_writer.write(frame)
 
     # Release video file
@@ -0,0 +1,64 @@
+"""
+Stages 1 + 2 in hybrid mode: ingestion tasks import cv2 in the thread pool
+while the process pool starts its workers. Workers must not inherit that
+half-finished import (regression: BrokenProcessPool on Linux), and the
+canvases must match a thread-only run.
+"""
+import os
+import sys
+import glob
+import shutil
+import subprocess
+
+import cv2
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATA = os.path.join(PROJECT_ROOT, "data", "test")
+
+# Fresh interpreter, so cv2 is first imported by the pool tasks as in a real run
+# (this test module has already imported it)
+STAGES_SCRIPT = """
+import sys
+from src.pipeline.executors import ExecutionBackend
+from src.pipeline.run_pipeline import run_ingestion_and_preprocessing
+
+if __name__ == "__main__":
+    with ExecutionBackend(sys.argv[2], max_workers=4) as backend:
+        run_ingestion_and_preprocessing(sys.argv[1], backend)
+"""
+
+
+def run_stages(tmp_path, mode):
+    root = os.path.join(tmp_path, mode)
+    shutil.copytree(TEST_DATA, os.path.join(root, "data", "raw"))
+    script = os.path.join(tmp_path, "run_stages.py")
+    with open(script, "w", encoding="utf-8") as f:
+        f.write(STAGES_SCRIPT)
+
+    result = subprocess.run(
+        [sys.executable, script, root, mode], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120,
+        env=dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    cleaned_root = os.path.join(root, "data", "preprocessed")
+    videos_root = os.path.join(root, "data", "videos")
+
+    canvases = {
+        os.path.relpath(path, cleaned_root): cv2.imread(path, cv2.IMREAD_GRAYSCALE).tobytes()
+        for path in glob.glob(os.path.join(cleaned_root, "*", "*", "*.png"))
+    }
+    videos = sorted(os.path.relpath(p, videos_root) for p in glob.glob(os.path.join(videos_root, "*", "*.avi")))
+    return canvases, videos
+
+
+def test_hybrid_ingestion_and_preprocessing(tmp_path):
+    n_frames = sum(len(files) for _, _, files in os.walk(TEST_DATA))
+    n_runs = len(os.listdir(TEST_DATA))
+
+    canvases, videos = run_stages(tmp_path, "hybrid")
+    assert len(canvases) == 4 * n_frames  # one canvas per zone and frame
+    assert len(videos) == 4 * n_runs
+
+    reference, _ = run_stages(tmp_path, "thread")
+    assert canvases == reference